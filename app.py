@@ -1,16 +1,33 @@
 import streamlit as st
 import pandas as pd
+import hashlib
 import json
-from scripts.utils import busiest_windows
+import os
+from scripts.aggregates import day_aggregates
+from scripts.artifacts import artifact_aggregates, read_artifact
+from scripts.storage import read_table
 import matplotlib.pyplot as plt
 
+# Bounded cache sizes: parsed uploads are large, per-date aggregates are small
+UPLOAD_CACHE_ENTRIES = 4
+AGGREGATE_CACHE_ENTRIES = 64
+
 st.set_page_config(page_title="Flight Schedule Optimizer — Extended Data", layout="wide")
 st.title("✈️ Flight Schedule Optimizer — Extended BTS Data")
 
 with st.sidebar:
-    st.header("Upload Files")
-    raw_up = st.file_uploader("Upload normalized_week.csv", type=["csv"])
-    opt_up = st.file_uploader("Upload optimized_schedule.csv", type=["csv"])
+    st.header("Summaries")
+    # Compact artifacts written by the prepare and optimize stages; charts are drawn from these
+    prep_sum_path = st.text_input("Prepared summary", value="data/normalized_week.summary.json.gz")
+    opt_sum_path = st.text_input("Optimized summary", value="data/optimized_schedule.summary.json.gz")
+    prep_sum_up = st.file_uploader("...or upload the prepared summary", type=["gz"])
+    opt_sum_up = st.file_uploader("...or upload the optimized summary", type=["gz"])
+    st.markdown("---")
+    st.header("Per-flight Detail (optional)")
+    raw_up = st.file_uploader("Upload normalized_week.csv", type=["csv", "parquet"])
+    opt_up = st.file_uploader("Upload optimized_schedule.csv", type=["csv", "parquet"])
+    raw_path = st.text_input("...or local normalized dataset path (CSV or partitioned Parquet)")
+    opt_path = st.text_input("...or local optimized schedule path (CSV or Parquet)")
     st.markdown("---")
     st.header("Select Date for Analysis")
     selected_date = st.date_input("Choose flight date", value=pd.to_datetime("2025-01-01"), 
@@ -29,16 +46,73 @@ with st.sidebar:
 def load_df(file):
     if file is None:
         return None
-    df = pd.read_csv(file)
+    if file.name.endswith(".parquet"):
+        df = pd.read_parquet(file)
+    else:
+        df = pd.read_csv(file)
     df.columns = df.columns.str.lower()
     return df
 
-raw_df = load_df(raw_up)
-opt_df = load_df(opt_up)
+def upload_key(file):
+    """Content hash identifying an upload across reruns."""
+    return None if file is None else hashlib.sha1(file.getvalue()).hexdigest()
+
+def partition_by_date(df, date_col):
+    """Parse datetimes once and split the rows into a {date: DataFrame} dict sorted by time."""
+    for col in ("sched_dep", "opt_dep"):
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col])
+    df = df.sort_values(date_col)
+    return {date: part for date, part in df.groupby(df[date_col].dt.date, sort=False)}
+
+@st.cache_resource(max_entries=UPLOAD_CACHE_ENTRIES, show_spinner="Parsing upload...")
+def parse_upload(key, date_col, _file):
+    # Cached by content hash; ``_file`` is not hashed. The result is shared and treated as read-only.
+    return partition_by_date(load_df(_file), date_col)
+
+@st.cache_resource(max_entries=UPLOAD_CACHE_ENTRIES, show_spinner="Reading dataset...")
+def read_local_date(path, mtime, date):
+    # Only the selected date's partition is read from a local dataset
+    return partition_by_date(read_table(path, filters=[("flightdate", "==", str(date))]), "sched_dep")
+
+@st.cache_resource(max_entries=UPLOAD_CACHE_ENTRIES, show_spinner="Reading optimized schedule...")
+def read_local_opt(path, mtime, date):
+    # Only flights scheduled on the selected date (windows never cross midnight, so opt_dep stays on it)
+    start = pd.Timestamp(date)
+    day = read_table(path, filters=[("sched_dep", ">=", start), ("sched_dep", "<", start + pd.Timedelta(days=1))])
+    return partition_by_date(day, "opt_dep")
+
+@st.cache_resource(max_entries=UPLOAD_CACHE_ENTRIES)
+def load_artifact(key, _source):
+    # ``key`` is a content hash or path@mtime; the artifact is shared and treated as read-only
+    return read_artifact(_source)
+
+def artifact_source(upload, path):
+    """(cache key, source) of a summary artifact: an upload wins over a local path."""
+    if upload is not None:
+        return upload_key(upload), upload
+    if path and os.path.exists(path):
+        return f"{path}@{os.path.getmtime(path)}", path
+    return None, None
+
+@st.cache_data(max_entries=AGGREGATE_CACHE_ENTRIES)
+def date_aggregates(raw_key, opt_key, date, capacity_mode, capacity_per_bucket, _raw_day, _opt_day):
+    return day_aggregates(_raw_day, _opt_day, bucket_minutes=5, capacity_per_bucket=capacity_per_bucket)
 
-def get_bucket(dt_col):
-    dt_col = pd.to_datetime(dt_col)
-    return dt_col.dt.hour * 60 + dt_col.dt.minute // 5
+raw_key, opt_key = upload_key(raw_up), upload_key(opt_up)
+raw_parts = parse_upload(raw_key, "sched_dep", raw_up) if raw_up is not None else None
+if raw_parts is None and raw_path and os.path.exists(raw_path):
+    raw_key = f"{raw_path}@{os.path.getmtime(raw_path)}"
+    raw_parts = read_local_date(raw_path, os.path.getmtime(raw_path), selected_date)
+opt_parts = parse_upload(opt_key, "opt_dep", opt_up) if opt_up is not None else None
+if opt_parts is None and opt_path and os.path.exists(opt_path):
+    opt_key = f"{opt_path}@{os.path.getmtime(opt_path)}"
+    opt_parts = read_local_opt(opt_path, os.path.getmtime(opt_path), selected_date)
+
+prep_sum_key, prep_sum_src = artifact_source(prep_sum_up, prep_sum_path)
+opt_sum_key, opt_sum_src = artifact_source(opt_sum_up, opt_sum_path)
+prep_art = load_artifact(prep_sum_key, prep_sum_src) if prep_sum_src is not None else None
+opt_art = load_artifact(opt_sum_key, opt_sum_src) if opt_sum_src is not None else None
 
 def bucket_to_time(bucket):
     minutes = bucket * 5
@@ -64,30 +138,47 @@ except Exception:
     usage_perc = {}
     capacity_limit = 60
 
-if raw_df is not None and len(raw_df):
-    raw_df['sched_dep'] = pd.to_datetime(raw_df['sched_dep'])
-    filtered_raw = raw_df[raw_df['sched_dep'].dt.date == selected_date].copy()
-    st.success(f"Loaded {len(filtered_raw):,} rows for {selected_date} from normalized_week.csv.")
+def draw_histogram(hist, color):
+    fig, ax = plt.subplots()
+    if hist["counts"]:
+        edges = hist["edges"]
+        widths = [b - a for a, b in zip(edges[:-1], edges[1:])]
+        ax.bar(edges[:-1], hist["counts"], width=widths, align="edge", color=color, alpha=0.7)
+    return fig, ax
+
+if prep_art or raw_parts:
+    capacity_per_bucket = max(1, int(capacity_limit * 5 / 60))
+    filtered_raw = raw_parts.get(selected_date) if raw_parts else None
+    filtered_opt = opt_parts.get(selected_date) if opt_parts is not None else None
+    if prep_art:
+        airports = sorted(prep_art["days"].get(str(selected_date), {}))
+        chosen_airports = st.sidebar.multiselect("Airports (default: all)", airports)
+        agg = artifact_aggregates(prep_art, opt_art, selected_date, airports=chosen_airports or None,
+                                  capacity_per_bucket=capacity_per_bucket)
+        st.success(f"Summarized {agg['rows']:,} flights for {selected_date} from the prepared summary.")
+        if filtered_raw is not None and chosen_airports:
+            filtered_raw = filtered_raw[filtered_raw["origin"].isin(chosen_airports)]
+        if filtered_opt is not None and chosen_airports:
+            filtered_opt = filtered_opt[filtered_opt["origin"].isin(chosen_airports)]
+    else:
+        if filtered_raw is None:
+            filtered_raw = next(iter(raw_parts.values())).iloc[0:0]
+        agg = date_aggregates(raw_key, opt_key, selected_date, capacity_mode_choice, capacity_per_bucket,
+                              filtered_raw, filtered_opt)
+        st.success(f"Loaded {agg['rows']:,} rows for {selected_date} from normalized_week.csv.")
 
-    bw = busiest_windows(filtered_raw, bucket_minutes=5, window_buckets=6)
+    bw = agg["busiest"]
     st.subheader("Busiest 30-min Windows (Filtered Date)")
     st.dataframe(bw)
 
-    filtered_raw['sched_bucket'] = get_bucket(filtered_raw['sched_dep'])
-    sched_counts = filtered_raw.groupby('sched_bucket').size()
+    sched_counts = agg["sched_counts"].copy()
     sched_counts.index = sched_counts.index.map(bucket_to_time)
 
-    if opt_df is not None and len(opt_df):
-        opt_df['opt_dep'] = pd.to_datetime(opt_df['opt_dep'])
-        opt_df['sched_dep'] = pd.to_datetime(opt_df['sched_dep'])
-        filtered_opt = opt_df[opt_df['opt_dep'].dt.date == selected_date].copy()
-        st.success(f"Loaded {len(filtered_opt):,} rows for {selected_date} from optimized_schedule.csv.")
-
-        filtered_opt['opt_bucket'] = get_bucket(filtered_opt['opt_dep'])
-        opt_counts = filtered_opt.groupby('opt_bucket').size()
+    if "opt_counts" in agg:
+        st.success(f"Loaded {agg['opt_rows']:,} optimized flights for {selected_date}.")
+        opt_counts = agg["opt_counts"].copy()
         opt_counts.index = opt_counts.index.map(bucket_to_time)
     else:
-        filtered_opt = None
         opt_counts = None
 
     # Congestion Over Time Chart
@@ -99,8 +190,9 @@ if raw_df is not None and len(raw_df):
     st.line_chart(df_comp)
 
     st.write(f"Capacity mode '{capacity_mode_choice}' limit: {capacity_limit} departures per hour")
-    capacity_per_bucket = max(1, int(capacity_limit * 5 / 60))
     st.write(f"Estimated capacity per 5-minute bucket: {capacity_per_bucket}")
+    if "over_capacity_after" in agg:
+        st.write(f"Buckets over capacity: {agg['over_capacity_before']} before, {agg['over_capacity_after']} after optimization")
 
     # Additional congestion plot with capacity line
     fig, ax = plt.subplots()
@@ -115,8 +207,7 @@ if raw_df is not None and len(raw_df):
 
     # Delay distribution before optimization
     st.subheader("Departure Delay Distribution Before Optimization")
-    fig, ax = plt.subplots()
-    filtered_raw["dep_delay"].hist(bins=50, ax=ax, color="steelblue", alpha=0.7)
+    fig, ax = draw_histogram(agg["delay_hist"], "steelblue")
     ax.set_xlabel("Departure Delay (minutes)")
     ax.set_ylabel("Number of Flights")
     st.pyplot(fig)
@@ -133,11 +224,9 @@ if raw_df is not None and len(raw_df):
         st.pyplot(fig)
 
     # Distribution of timing changes after optimization
-    if filtered_opt is not None and len(filtered_opt) > 0:
+    if "shift_hist" in agg:
         st.subheader("Distribution of Departure Time Shifts After Optimization")
-        timing_diff = (filtered_opt["opt_dep"] - filtered_opt["sched_dep"]).dt.total_seconds() / 60
-        fig, ax = plt.subplots()
-        timing_diff.hist(bins=50, color="green", alpha=0.7, ax=ax)
+        fig, ax = draw_histogram(agg["shift_hist"], "green")
         ax.set_xlabel("Time Shift in Minutes (Optimized - Original)")
         ax.set_ylabel("Number of Flights")
         st.pyplot(fig)
@@ -147,21 +236,19 @@ if raw_df is not None and len(raw_df):
         st.subheader(f"Optimized Schedule for {selected_date}")
         cols_to_show = ["carrier", "tailnum", "origin", "dest", "sched_dep", "opt_dep", "dep_delay"]
         existing_cols = [c for c in cols_to_show if c in filtered_opt.columns]
-        st.dataframe(filtered_opt[existing_cols].sort_values("opt_dep"))
+        st.dataframe(filtered_opt[existing_cols])
 
     # Delay reasons summary
-    delay_reasons_cols = ["carrierdelay", "weatherdelay", "nasdelay", "securitydelay", "lateaircraftdelay"]
-    if all(col in filtered_raw.columns for col in delay_reasons_cols):
-        delay_summary = filtered_raw[delay_reasons_cols].describe().T
+    if "delay_causes" in agg:
         st.subheader("Delay Reasons Summary")
-        st.dataframe(delay_summary)
+        st.dataframe(agg["delay_causes"])
     else:
         st.info("Delay reason data not available.")
 
     # Cancellations count
-    if "cancelled" in filtered_raw.columns:
+    if "cancelled" in agg:
         st.subheader("Cancellations Count")
-        st.bar_chart(filtered_raw['cancelled'].value_counts())
+        st.bar_chart(agg["cancelled"])
     else:
         st.info("Cancellation data not available.")
 
@@ -173,19 +260,20 @@ if raw_df is not None and len(raw_df):
             st.dataframe(bw.head(8))
         elif "congested" in ql or "top" in ql:
             st.dataframe(bw.head(12))
+        elif ("high-impact" in ql or "retime" in ql) and filtered_raw is None:
+            st.info("Per-flight detail is needed for this query; add the normalized dataset in the sidebar.")
         elif "high-impact" in ql or "retime" in ql:
             st.write("Heuristic: flights inside top-3 busiest buckets.")
             top_buckets = bw["bucket"].head(3).tolist() if "bucket" in bw.columns else []
-            d = filtered_raw.copy()
-            d["dep_minute"] = pd.to_datetime(d["sched_dep"]).dt.hour * 60 + pd.to_datetime(d["sched_dep"]).dt.minute
-            d["bucket"] = (d["dep_minute"] // 5).astype(int)
-            out = d[d["bucket"].isin(top_buckets)].sort_values("depdelay", ascending=False).head(25)
+            d = filtered_raw
+            bucket = (d["sched_dep"].dt.hour * 60 + d["sched_dep"].dt.minute) // 5
+            out = d[bucket.isin(top_buckets)].sort_values("depdelay", ascending=False).head(25)
             st.dataframe(out[["carrier", "tailnum", "origin", "dest", "sched_dep", "depdelay", "count", "roll_15", "roll_60"]])
         else:
             st.info("No matching intent; try examples like 'busiest 30-min window'.")
 
 else:
-    st.warning("Upload the normalized_week.csv produced by the preparation script.")
+    st.warning("Point the sidebar at the summary written by the preparation script, or upload normalized_week.csv.")
 
 st.markdown("---")
 st.caption("Tip: After running optimizer, upload the optimized CSV to compare congestion.")
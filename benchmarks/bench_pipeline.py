@@ -0,0 +1,150 @@
+import argparse
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic_bts import generate
+from scripts.instrument import stage, start_run
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1M": 1_000_000, "10M": 10_000_000}
+
+def airport_config(codes, bucket=5):
+    """Capacity profiles for the synthetic airports, reusing JFK's modes from configs/airports.json."""
+    with open(os.path.join(os.path.dirname(__file__), "..", "configs", "airports.json")) as f:
+        base = json.load(f)["JFK"]
+    return {code: {**base, "bucket_minutes": bucket} for code in codes}
+
+def run_size(size, args):
+    """All stages for one input size in this process; returns the stage records (see scripts/instrument.py)."""
+    prepare = importlib.import_module("scripts.0_prepare_bts")
+    train = importlib.import_module("scripts.1_train_model")
+    from scripts.aggregates import day_aggregates
+    from scripts.capacity import add_windows, flight_usage, profile_tables
+    from scripts.greedy import greedy_assign
+    from scripts.storage import write_table
+    from scripts.utils import add_demand_features
+
+    run = start_run("bench")
+    flights_per_day = max(1, round(size / (args.days * args.airports)))
+    with tempfile.TemporaryDirectory(dir=args.tmp_dir) as tmp:
+        raw_path = os.path.join(tmp, "raw.csv")
+        with stage(run, "generate", rows=size) as m:
+            raw = generate(days=args.days, airports=args.airports, flights_per_day=flights_per_day,
+                           legs_per_tail=args.legs_per_tail, seed=args.seed)
+            raw.to_csv(raw_path, index=False)
+            m["rows"] = len(raw)
+        del raw
+
+        with stage(run, "parse", rows=size) as m:
+            df = prepare.prepare_rows(pd.read_csv(raw_path, low_memory=False))
+            m["rows"] = len(df)
+        with stage(run, "features", rows=len(df)):
+            df = add_demand_features(df, copy=False)
+        with stage(run, "write", rows=len(df)) as m:
+            out_path = os.path.join(tmp, "normalized.parquet")
+            write_table(df, out_path, partition_cols=["FlightDate", "Origin"])
+            m["format"] = "parquet"
+        # Downstream stages see the lower-case names read_table returns
+        df = df.rename(columns=str.lower)
+
+        with stage(run, "train", rows=len(df)) as m:
+            from sklearn.ensemble import HistGradientBoostingRegressor
+            features = [f for f in train.FEATURES if f in df.columns]
+            fit_on, _ = train.chronological_split(df, 0.2)
+            model = HistGradientBoostingRegressor(max_iter=args.max_iter, random_state=42)
+            model.fit(fit_on[features].fillna(0).astype(np.float32), fit_on[train.TARGET].fillna(0).to_numpy(np.float32))
+            m["rows"] = len(fit_on)
+
+        with stage(run, "aggregate", rows=len(df)) as m:
+            airport = df["origin"].iloc[0]
+            flights = df[df["origin"] == airport]
+            days = 0
+            for _, raw_day in flights.groupby(flights["sched_dep"].dt.date):
+                day_aggregates(raw_day)
+                days += 1
+            m.update(rows=len(flights), days=days)
+
+        # Optimization stages plan the first --optimize_days days of the network
+        first = df["sched_dep"].dt.normalize().min()
+        flights = df[df["sched_dep"] < first + pd.Timedelta(days=args.optimize_days)]
+        cfgs = airport_config(sorted(flights["origin"].astype(str).unique()))
+        bucket, tables, _ = profile_tables(cfgs, list(cfgs))
+        dfd = add_windows(flights, cfgs, list(cfgs), bucket).reset_index(drop=True)
+        lb, ub = dfd["bucket_lb"].to_numpy(), dfd["bucket_ub"].to_numpy()
+        sched = (dfd["minute"] // bucket).to_numpy()
+        usage, capacity, _ = flight_usage(dfd, lb, ub, sched, bucket, tables)
+        del df
+
+        with stage(run, "greedy", rows=len(dfd)):
+            greedy_assign(lb, ub, sched, usage, capacity)
+
+        from scripts.model_builder import (build_assignment_model, deviation_costs, make_pairs, ortools_available,
+                                           solve_assignment, usage_pairs)
+        if ortools_available():
+            with stage(run, "build", rows=len(dfd)) as m:
+                pairs = make_pairs(lb, ub)
+                members, slots = usage_pairs(pairs, lb, ub, usage)
+                model, x, stats = build_assignment_model(pairs, deviation_costs(pairs, sched),
+                                                         [(members, slots, capacity)])
+                m.update(stats)
+            with stage(run, "solve", rows=len(dfd)) as m:
+                _, stats = solve_assignment(model, x, pairs, sched, args.time_limit, args.workers)
+                m.update({k: stats[k] for k in ("status", "objective", "bound", "gap")})
+    return run["records"]
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def main(args):
+    if args.worker:
+        # One size per process so peak RSS is not inflated by earlier, larger runs
+        for record in run_size(SIZES.get(args.worker, None) or int(args.worker), args):
+            print(json.dumps(record), flush=True)
+        return
+
+    run = {"run": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": git_commit(), "python": platform.python_version(),
+           "pandas": pd.__version__, "numpy": np.__version__, "machine": platform.machine(), "cpus": os.cpu_count()}
+    passthrough = [f"--{k}={v}" for k, v in vars(args).items()
+                   if k not in ("sizes", "results", "worker") and v is not None]
+    with open(args.results, "a") as out:
+        for label in args.sizes.split(","):
+            proc = subprocess.run([sys.executable, "-m", "benchmarks.bench_pipeline", f"--worker={label}", *passthrough],
+                                  capture_output=True, text=True)
+            if proc.returncode != 0:
+                print(f"{label}: failed\n{proc.stderr[-2000:]}", file=sys.stderr)
+                out.write(json.dumps({**run, "size": label, "stage": "error", "error": proc.stderr[-500:]}) + "\n")
+                continue
+            for line in proc.stdout.splitlines():
+                record = {**run, "size": label, **json.loads(line)}
+                out.write(json.dumps(record) + "\n")
+                print(f"{label:>5} {record['stage']:<10} {record['rows']:>11,} rows {record['wall_s']:>9.3f}s "
+                      f"{record['peak_rss_mb']:>9.1f} MB")
+            out.flush()
+    print(f"Results appended → {args.results}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10k,100k,1M,10M", help="Comma-separated sizes (10k, 100k, 1M, 10M or row counts)")
+    parser.add_argument("--results", default="benchmarks/results.jsonl", help="JSON lines file the records are appended to")
+    parser.add_argument("--days", type=int, default=31)
+    parser.add_argument("--airports", type=int, default=10)
+    parser.add_argument("--legs_per_tail", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max_iter", type=int, default=50, help="Boosting iterations for the train stage")
+    parser.add_argument("--optimize_days", type=int, default=1, help="Days of the network planned by greedy/build/solve")
+    parser.add_argument("--time_limit", type=float, default=30.0, help="CP-SAT time budget of the solve stage")
+    parser.add_argument("--workers", type=int, default=8, help="CP-SAT search workers")
+    parser.add_argument("--tmp_dir", default=None, help="Directory for the generated CSV and Parquet files")
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    main(args)
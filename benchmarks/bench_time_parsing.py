@@ -0,0 +1,61 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from scripts.utils import combine_date_time
+
+def legacy_parse_hhmm(series):
+    """Previous HHMM parsing: zero-padded 'HHMM' strings from HHMM or integer times (e.g., 945), kept for comparison."""
+    s = series.astype(str).str.replace(r'\.0$', '', regex=True).str.replace(r'\D', '', regex=True).str.strip()
+    s = s.replace({'': pd.NA, 'nan': pd.NA})
+    s = s.fillna('')
+    s = s.apply(lambda x: x.zfill(4) if len(x) in (1,2,3) else x)
+    # Some BTS exports encode midnight as '2400' -> map to '0000'
+    s = s.replace({'2400':'0000'})
+    return s
+
+def legacy_combine_date_time(date_series, hhmm_series):
+    """Previous string-based implementation (strftime + zero-padded HHMM + to_datetime), kept for comparison."""
+    d = pd.to_datetime(date_series, errors='coerce')
+    t = legacy_parse_hhmm(hhmm_series)
+    mask = t.eq('') | t.isna()
+    dt_str = d.dt.strftime('%Y-%m-%d') + t
+    out = pd.to_datetime(dt_str, format='%Y-%m-%d%H%M', errors='coerce')
+    out[mask] = pd.NaT
+    return out
+
+def make_inputs(rows, days, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2025-01-01", periods=days).strftime("%Y-%m-%d")
+    minutes = rng.integers(0, 1440, rows)
+    hhmm = ((minutes // 60) * 100 + minutes % 60).astype(float)
+    hhmm[rng.random(rows) < 0.02] = np.nan
+    return pd.Series(rng.choice(dates, rows)), pd.Series(hhmm)
+
+def timed(fn, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+def main(args):
+    dates, hhmm = make_inputs(args.rows, args.days)
+    legacy_time, legacy = timed(legacy_combine_date_time, dates, hhmm, repeat=args.repeat)
+    fast_time, fast = timed(combine_date_time, dates, hhmm, repeat=args.repeat)
+
+    # Results must agree except for 2400, which now rolls over to the next day
+    same = (legacy.eq(fast) | (legacy.isna() & fast.isna())).mean()
+    print(f"rows={args.rows:,} days={args.days}")
+    print(f"legacy combine_date_time: {legacy_time:.3f}s ({args.rows / legacy_time:,.0f} rows/s)")
+    print(f"vectorized combine_date_time: {fast_time:.3f}s ({args.rows / fast_time:,.0f} rows/s)")
+    print(f"speedup: {legacy_time / fast_time:.1f}x, identical results: {same:.2%}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=31)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    main(args)
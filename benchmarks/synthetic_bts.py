@@ -0,0 +1,127 @@
+import argparse
+import numpy as np
+import pandas as pd
+
+# Busy US airports used as synthetic codes (the first ones also have profiles in configs/airports.json)
+AIRPORTS = ["JFK", "LGA", "EWR", "ATL", "ORD", "DFW", "DEN", "LAX", "SFO", "SEA",
+            "MIA", "BOS", "PHX", "IAH", "CLT", "MSP", "DTW", "PHL", "BWI", "SLC"]
+CARRIERS = ["AA", "DL", "UA", "WN", "B6", "AS", "NK", "F9"]
+CAUSE_COLS = ["CARRIER_DELAY", "WEATHER_DELAY", "NAS_DELAY", "SECURITY_DELAY", "LATE_AIRCRAFT_DELAY"]
+
+def parse_peaks(text):
+    """'07:30,17:30' -> array of peak minutes."""
+    return np.array([int(h) * 60 + int(m) for h, m in (p.split(":") for p in text.split(","))])
+
+def first_departures(rng, n, peaks, peak_share, peak_width):
+    """First departure minute of each tail: a mixture of a flat day (05:00-22:00) and Gaussian peaks."""
+    minute = rng.uniform(300, 1320, n)
+    at_peak = rng.random(n) < peak_share
+    minute[at_peak] = rng.normal(peaks[rng.integers(0, len(peaks), at_peak.sum())], peak_width)
+    return np.clip(minute, 0, 1439).astype(np.int64)
+
+def hhmm(minutes):
+    """Minutes (wrapping at midnight) -> HHMM as float, like the BTS columns."""
+    m = np.asarray(minutes, dtype=np.int64) % 1440
+    return ((m // 60) * 100 + m % 60).astype(np.float64)
+
+def generate(days=31, airports=10, flights_per_day=500, legs_per_tail=4, peaks="07:30,17:30",
+             peak_share=0.4, peak_width=45, min_turn=35, cancel_rate=0.015, seed=0):
+    """Synthetic flights in the raw BTS on-time schema (the columns 0_prepare_bts.py reads).
+
+    ``flights_per_day`` is per airport (departures), so the table has about
+    ``days * airports * flights_per_day`` rows. Each tail flies a chain of ``legs_per_tail`` legs a
+    day: every leg departs from the previous leg's destination at least ``min_turn`` minutes after
+    it lands. First departures follow ``peaks`` (``peak_share`` of tails, ``peak_width`` minutes
+    wide); delays are heavy-tailed, propagate along the chain and are split into delay causes.
+    """
+    rng = np.random.default_rng(seed)
+    codes = np.array(AIRPORTS[:airports])
+    target = days * airports * flights_per_day
+    # Oversample: legs pushed past midnight are dropped below
+    tails_per_day = int(np.ceil(target / days / legs_per_tail * 2)) + 1
+    dates = pd.date_range("2025-01-01", periods=days)
+    fleet = max(tails_per_day, 1)
+
+    n_tails = days * tails_per_day
+    tail = np.repeat(np.arange(n_tails), legs_per_tail)
+    day = tail // tails_per_day
+    # Airport chain per tail: a random walk that never stays put, so each leg departs where the last one landed
+    start = rng.integers(0, airports, n_tails)
+    steps = rng.integers(1, airports, (n_tails, legs_per_tail)) if airports > 1 else \
+        np.zeros((n_tails, legs_per_tail), dtype=np.int64)
+    walk = (start[:, None] + np.concatenate([np.zeros((n_tails, 1), dtype=np.int64), np.cumsum(steps, axis=1)], axis=1)) % airports
+    origin = walk[:, :-1].ravel()
+    dest = walk[:, 1:].ravel()
+    block = rng.integers(60, 300, len(tail))
+    turn = min_turn + rng.integers(0, 60, len(tail))
+    # Scheduled departure = first departure + earlier legs' block and turn times
+    elapsed = np.cumsum((block + turn).reshape(n_tails, legs_per_tail), axis=1) - (block + turn).reshape(n_tails, legs_per_tail)
+    dep = np.repeat(first_departures(rng, n_tails, parse_peaks(peaks), peak_share, peak_width), legs_per_tail) + elapsed.ravel()
+    arr = dep + block
+
+    # Delays: heavy-tailed own delay plus whatever the previous leg could not absorb in its turn
+    own = np.rint(rng.gamma(0.6, 18, len(tail)) - 6).astype(np.int64)
+    delay = own.reshape(n_tails, legs_per_tail).copy()
+    late = np.zeros_like(delay)
+    for j in range(1, legs_per_tail):
+        late[:, j] = np.maximum(delay[:, j - 1] - (turn.reshape(n_tails, legs_per_tail)[:, j - 1] - min_turn), 0)
+        delay[:, j] += late[:, j]
+    delay, late = delay.ravel(), late.ravel()
+
+    # Legs pushed past midnight are dropped; thin the rest evenly down to the target size
+    idx = np.flatnonzero(dep < 1440)
+    if len(idx) > target:
+        idx = np.sort(rng.choice(idx, target, replace=False))
+    n = len(idx)
+    dep, arr, delay, late = dep[idx], arr[idx], delay[idx], late[idx]
+    cancelled = rng.random(n) < cancel_rate
+
+    df = pd.DataFrame({
+        "FL_DATE": dates[day[idx]].strftime("%Y-%m-%d"),
+        "OP_UNIQUE_CARRIER": np.array(CARRIERS)[tail[idx] % len(CARRIERS)],
+        "TAIL_NUM": np.char.add("N", (tail[idx] % fleet).astype(str)),
+        "ORIGIN": codes[origin[idx]],
+        "DEST": codes[dest[idx]],
+        "CRS_DEP_TIME": hhmm(dep),
+        "DEP_TIME": np.where(cancelled, np.nan, hhmm(dep + delay)),
+        "CRS_ARR_TIME": hhmm(arr),
+        "ARR_TIME": np.where(cancelled, np.nan, hhmm(arr + delay)),
+        "DEP_DELAY": np.where(cancelled, np.nan, delay),
+        "DEP_DEL15": np.where(cancelled, np.nan, (delay >= 15).astype(float)),
+        "ARR_DELAY": np.where(cancelled, np.nan, delay),
+        "ARR_DEL15": np.where(cancelled, np.nan, (delay >= 15).astype(float)),
+        "CANCELLED": cancelled.astype(float),
+        "CANCELLATION_CODE": np.where(cancelled, rng.choice(["A", "B", "C"], n), ""),
+    })
+    # BTS writes midnight as 2400 for some flights
+    df.loc[df["CRS_DEP_TIME"] == 0, "CRS_DEP_TIME"] = 2400
+
+    # Delay causes are only reported for arrivals 15+ minutes late
+    reported = ~cancelled & (delay >= 15)
+    share = rng.dirichlet(np.ones(4), n) * np.maximum(delay - late, 0)[:, None]
+    causes = np.column_stack([share[:, 0], share[:, 1], share[:, 2], share[:, 3], late]).round()
+    for k, col in enumerate(CAUSE_COLS):
+        df[col] = np.where(reported, causes[:, k], np.nan)
+    return df
+
+def main(args):
+    df = generate(days=args.days, airports=args.airports, flights_per_day=args.flights_per_day,
+                  legs_per_tail=args.legs_per_tail, peaks=args.peaks, peak_share=args.peak_share,
+                  peak_width=args.peak_width, min_turn=args.min_turn, seed=args.seed)
+    df.to_csv(args.output_csv, index=False)
+    print(f"Wrote {len(df):,} synthetic flights ({args.days} days, {args.airports} airports) → {args.output_csv}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output_csv", default="data/synthetic_bts.csv")
+    parser.add_argument("--days", type=int, default=31)
+    parser.add_argument("--airports", type=int, default=10, help=f"Number of airports (up to {len(AIRPORTS)})")
+    parser.add_argument("--flights_per_day", type=int, default=500, help="Departures per airport and day")
+    parser.add_argument("--legs_per_tail", type=int, default=4, help="Tail reuse: legs each aircraft flies per day")
+    parser.add_argument("--peaks", default="07:30,17:30", help="Comma-separated HH:MM departure peaks")
+    parser.add_argument("--peak_share", type=float, default=0.4, help="Share of first departures around the peaks")
+    parser.add_argument("--peak_width", type=float, default=45, help="Standard deviation of each peak in minutes")
+    parser.add_argument("--min_turn", type=int, default=35, help="Minimum turnaround in minutes")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    main(args)
@@ -1,67 +1,190 @@
 import argparse
+import os
+import tempfile
 import pandas as pd
-from scripts.utils import combine_date_time, add_demand_features, label_delays
-
-def main(args):
-    df = pd.read_csv(args.input_csv, low_memory=False)
-
-    # Rename key columns to consistent internal names
-    rename_map = {
-        "FL_DATE": "FlightDate",
-        "OP_UNIQUE_CARRIER": "Carrier",
-        "TAIL_NUM": "TailNum",
-        "ORIGIN": "Origin",
-        "DEST": "Dest",
-        "CRS_DEP_TIME": "CRSDepTime",
-        "DEP_TIME": "DepTime",
-        "CRS_ARR_TIME": "CRSArrTime",
-        "ARR_TIME": "ArrTime",
-        "DEP_DELAY": "DepDelay",
-        "DEP_DEL15": "DepDel15",
-        "ARR_DELAY": "ArrDelay",
-        "ARR_DEL15": "ArrDel15",
-        "CANCELLED": "Cancelled",
-        "CANCELLATION_CODE": "CancellationCode",
-        "CARRIER_DELAY": "CarrierDelay",
-        "WEATHER_DELAY": "WeatherDelay",
-        "NAS_DELAY": "NASDelay",
-        "SECURITY_DELAY": "SecurityDelay",
-        "LATE_AIRCRAFT_DELAY": "LateAircraftDelay"
-    }
-    df = df.rename(columns=rename_map)
-
-    # Create combined datetime columns
-    df["sched_dep"] = combine_date_time(df["FlightDate"], df["CRSDepTime"])
-    df["act_dep"] = combine_date_time(df["FlightDate"], df["DepTime"])
-    df["sched_arr"] = combine_date_time(df["FlightDate"], df["CRSArrTime"])
-    df["act_arr"] = combine_date_time(df["FlightDate"], df["ArrTime"])
+from scripts.artifacts import finalize, merge_summaries, resolve_summary_path, summarize, write_artifact
+from scripts.instrument import add_arguments, finish_run, stage, start_run
+from scripts.utils import combine_date_time, add_demand_features, demand_counts, label_delays, merge_demand_counts
+from scripts.storage import PARTITION_COLS, delete_partitions, is_parquet, partition_keys, write_table
+
+# Rename key columns to consistent internal names
+RENAME_MAP = {
+    "FL_DATE": "FlightDate",
+    "OP_UNIQUE_CARRIER": "Carrier",
+    "TAIL_NUM": "TailNum",
+    "ORIGIN": "Origin",
+    "DEST": "Dest",
+    "CRS_DEP_TIME": "CRSDepTime",
+    "DEP_TIME": "DepTime",
+    "CRS_ARR_TIME": "CRSArrTime",
+    "ARR_TIME": "ArrTime",
+    "DEP_DELAY": "DepDelay",
+    "DEP_DEL15": "DepDel15",
+    "ARR_DELAY": "ArrDelay",
+    "ARR_DEL15": "ArrDel15",
+    "CANCELLED": "Cancelled",
+    "CANCELLATION_CODE": "CancellationCode",
+    "CARRIER_DELAY": "CarrierDelay",
+    "WEATHER_DELAY": "WeatherDelay",
+    "NAS_DELAY": "NASDelay",
+    "SECURITY_DELAY": "SecurityDelay",
+    "LATE_AIRCRAFT_DELAY": "LateAircraftDelay"
+}
+
+NUMERIC_COLS = [
+    "DepDelay", "ArrDelay", "DepDel15", "ArrDel15",
+    "Cancelled", "CarrierDelay", "WeatherDelay", "NASDelay",
+    "SecurityDelay", "LateAircraftDelay"
+]
+
+# Compact dtypes used by the streaming reader, keyed by internal name
+STREAM_DTYPES = {
+    "FlightDate": "category", "Carrier": "category", "TailNum": "category",
+    "Origin": "category", "Dest": "category", "CancellationCode": "category",
+    "CRSDepTime": "float32", "DepTime": "float32", "CRSArrTime": "float32", "ArrTime": "float32",
+    **{col: "float32" for col in NUMERIC_COLS},
+}
+
+def prepare_rows(df, airport=None, run=None):
+    """Per-row preparation: rename, airport filter, datetimes, numeric cleanup and delay labels.
+
+    With an instrumentation ``run`` (see instrument.py) the datetime parsing is logged as its own stage.
+    """
+    df = df.rename(columns=RENAME_MAP)
+    if airport:
+        df = df[df["Origin"] == airport.upper()]
+
+    # Create combined datetime columns; actual times and arrivals may fall on the next (or previous) day
+    with stage(run, "combine_date_time", rows_in=len(df)):
+        sched_dep = combine_date_time(df["FlightDate"], df["CRSDepTime"])
+        sched_arr = combine_date_time(df["FlightDate"], df["CRSArrTime"], ref=sched_dep, max_early_minutes=360)
+        df = df.assign(
+            sched_dep=sched_dep,
+            act_dep=combine_date_time(df["FlightDate"], df["DepTime"], ref=sched_dep),
+            sched_arr=sched_arr,
+            act_arr=combine_date_time(df["FlightDate"], df["ArrTime"], ref=sched_arr),
+        )
 
     # Drop rows missing scheduled departure datetime (mandatory)
     df = df.dropna(subset=["sched_dep"])
 
     # Convert delay and cancellation related columns to numeric & fill missing
-    numeric_cols = [
-        "DepDelay", "ArrDelay", "DepDel15", "ArrDel15",
-        "Cancelled", "CarrierDelay", "WeatherDelay", "NASDelay",
-        "SecurityDelay", "LateAircraftDelay"
-    ]
-    for col in numeric_cols:
+    for col in NUMERIC_COLS:
         if col in df.columns:
             df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
 
-    # Add delay flags and demand features
-    df = label_delays(df)
-    df = add_demand_features(df, bucket_minutes=args.bucket_minutes)
+    df = label_delays(df, copy=False)
+    df["FlightDate"] = pd.to_datetime(df["FlightDate"], errors="coerce")
+    return df
 
-    # Save full dataframe with all columns + features
-    df.to_csv(args.output_csv, index=False)
-    print(f"Prepared {len(df)} rows with extended features → {args.output_csv}")
+def main(args, data=None):
+    """Prepare the raw download; returns ``data`` with the prepared frame as ``flights`` for chained stages.
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser()
+    A chunked run never holds the whole result, so it hands over the written ``flights_path`` instead.
+    """
+    data = {} if data is None else data
+    if args.chunksize and not args.output_csv:
+        raise SystemExit("--chunksize writes the prepared data to disk; pass an --output_csv path (CSV or .parquet)")
+    run = start_run("prepare", args)
+    if args.chunksize:
+        main_streaming(args, run)
+        data.pop("flights", None)
+        data["flights_path"] = args.output_csv
+        return data
+
+    with stage(run, "read_csv") as s:
+        df = pd.read_csv(args.input_csv, low_memory=False)
+        s["rows_out"] = len(df)
+    with stage(run, "prepare_rows", rows_in=len(df)) as s:
+        df = prepare_rows(df, airport=args.airport, run=run)
+        s["rows_out"] = len(df)
+
+    # Add demand features
+    with stage(run, "demand_features", rows_in=len(df)):
+        df = add_demand_features(df, bucket_minutes=args.bucket_minutes, copy=False)
+
+    # Save full dataframe with all columns + features (Parquet output is partitioned by date and origin)
+    if args.output_csv:
+        with stage(run, "write", rows_out=len(df)):
+            write_table(df, args.output_csv, partition_cols=PARTITION_COLS)
+    artifact_path = resolve_summary_path(args.summary_path, args.output_csv)
+    if artifact_path:
+        with stage(run, "summary", rows_in=len(df)):
+            write_artifact(finalize(summarize(df, args.bucket_minutes), "prepare", args.bucket_minutes), artifact_path)
+        print(f"Dashboard summary → {artifact_path}")
+    finish_run(run, rows_out=len(df))
+    print(f"Prepared {len(df)} rows with extended features → {args.output_csv or 'memory'}")
+    data.pop("flights_path", None)
+    data["flights"] = df
+    return data
+
+def main_streaming(args, run=None):
+    """Two-pass chunked preparation whose peak memory is bounded by ``--chunksize``.
+
+    Pass 1 reads only the known columns with compact dtypes, filters by airport, computes the
+    per-row features, accumulates per-(date, origin, bucket) demand counts and spools each chunk to a temporary
+    directory. Pass 2 attaches the final demand features and appends each chunk to the output.
+    """
+    wanted = set(RENAME_MAP) | set(RENAME_MAP.values())
+    inverse = {v: k for k, v in RENAME_MAP.items()}
+    dtypes = {**STREAM_DTYPES, **{inverse[k]: v for k, v in STREAM_DTYPES.items()}}
+    counts = {}
+    summary = {}
+    partitions = set()
+    rows = 0
+
+    out_dir = os.path.dirname(os.path.abspath(args.output_csv))
+    with tempfile.TemporaryDirectory(dir=out_dir) as spool:
+        chunks = pd.read_csv(args.input_csv, usecols=lambda c: c in wanted, dtype=dtypes,
+                             chunksize=args.chunksize)
+        paths = []
+        with stage(run, "prepare_chunks") as s:
+            rows_in = 0
+            for k, chunk in enumerate(chunks):
+                rows_in += len(chunk)
+                chunk = prepare_rows(chunk, airport=args.airport)
+                merge_demand_counts(counts, demand_counts(chunk, args.bucket_minutes))
+                merge_summaries(summary, summarize(chunk, args.bucket_minutes))
+                partitions |= partition_keys(chunk)
+                paths.append(os.path.join(spool, f"chunk_{k:05d}.pkl"))
+                chunk.to_pickle(paths[-1])
+            s.update(rows_in=rows_in, chunks=len(paths))
+
+        with stage(run, "features_and_write") as s:
+            # Every chunk appends, so first replace the partitions this run writes (like a single write)
+            if is_parquet(args.output_csv):
+                delete_partitions(args.output_csv, partitions)
+            for k, path in enumerate(paths):
+                chunk = add_demand_features(pd.read_pickle(path), bucket_minutes=args.bucket_minutes,
+                                            copy=False, counts=counts)
+                write_table(chunk, args.output_csv, partition_cols=PARTITION_COLS,
+                            append=k > 0 or is_parquet(args.output_csv))
+                rows += len(chunk)
+                os.remove(path)
+            s["rows_out"] = rows
+    artifact_path = resolve_summary_path(args.summary_path, args.output_csv)
+    if artifact_path:
+        write_artifact(finalize(summary, "prepare", args.bucket_minutes), artifact_path)
+        print(f"Dashboard summary → {artifact_path}")
+    finish_run(run, rows_out=rows, chunks=len(paths))
+
+    print(f"Prepared {rows} rows in {len(paths)} chunks with extended features → {args.output_csv}")
+
+def build_parser(parser=None):
+    """Command-line options (``python -m scripts`` passes its subcommand parser)."""
+    parser = parser or argparse.ArgumentParser()
     parser.add_argument("--input_csv", required=True)
-    parser.add_argument("--airport", required=False)
-    parser.add_argument("--output_csv", default="data/normalized_week.csv")
+    parser.add_argument("--airport", required=False, help="Keep only departures from this origin airport")
+    parser.add_argument("--output_csv", default="data/normalized_week.csv",
+                        help="CSV file, or a .parquet path for a dataset partitioned by FlightDate/Origin "
+                             "('' keeps the result in memory for chained stages)")
     parser.add_argument("--bucket_minutes", type=int, default=5)
-    args = parser.parse_args()
-    main(args)
+    parser.add_argument("--chunksize", type=int, default=0,
+                        help="Stream the input in chunks of this many rows (0 = load the whole file)")
+    parser.add_argument("--summary_path", default=None,
+                        help="Compact per-(date, airport) dashboard summary (default: <output>.summary.json.gz; '' to skip)")
+    add_arguments(parser)
+    return parser
+
+if __name__ == "__main__":
+    main(build_parser().parse_args())
@@ -1,40 +1,109 @@
 import argparse
-import pandas as pd
-import joblib
-from sklearn.ensemble import GradientBoostingRegressor
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_absolute_error
+import os
+import time
+import numpy as np
+from scripts.instrument import add_arguments, finish_run, stage, start_run
+from scripts.storage import read_table, select_table
 
-def main(args):
-    df = pd.read_csv(args.input_csv)
+# Only features known when the schedule is built (the *delay cause columns are recorded after the fact)
+FEATURES = ["minute", "dow", "count", "roll_15", "roll_60"]
+TARGET = "depdelay"
 
-    # Convert columns to lowercase for consistent naming
-    df.columns = df.columns.str.lower()
+def chronological_split(df, valid_fraction):
+    """Train on the earliest flights and validate on the most recent ``valid_fraction``."""
+    df = df.sort_values("sched_dep", kind="stable")
+    cut = int(len(df) * (1 - valid_fraction))
+    return df.iloc[:cut], df.iloc[cut:]
 
-    # Feature list including delays and cancellation features
-    features = [
-        "minute", "dow", "count", "roll_15", "roll_60",
-        "cancelled", "carrierdelay", "weatherdelay", "nasdelay",
-        "securitydelay", "lateaircraftdelay"
-    ]
-    features = [f for f in features if f in df.columns]
+def make_model(args):
+    import joblib
+    from sklearn.ensemble import GradientBoostingRegressor, HistGradientBoostingRegressor
 
-    X = df[features].fillna(0)
-    y = df["depdelay"].fillna(0)
+    if args.warm_start and os.path.exists(args.model_path):
+        model = joblib.load(args.model_path)
+        if isinstance(model, HistGradientBoostingRegressor):
+            # Continue boosting from the saved model on the new data
+            model.set_params(warm_start=True, max_iter=model.n_iter_ + args.max_iter)
+            return model
+        print(f"Saved model is {type(model).__name__}; training a new model instead of warm-starting")
+    if args.estimator == "gbr":
+        return GradientBoostingRegressor(random_state=42)
+    return HistGradientBoostingRegressor(max_iter=args.max_iter, learning_rate=0.1, random_state=42)
 
-    Xtr, Xte, ytr, yte = train_test_split(X, y, test_size=0.2, random_state=42)
+def main(args, data=None):
+    """Fit the delay model; uses ``data["flights"]`` (or ``flights_path``) from a chained prepare stage when present."""
+    import joblib
+    from sklearn.metrics import mean_absolute_error
 
-    model = GradientBoostingRegressor(random_state=42)
-    model.fit(Xtr, ytr)
+    data = {} if data is None else data
+    run = start_run("train", args)
+    with stage(run, "read") as s:
+        columns = FEATURES + [TARGET, "sched_dep"]
+        if "flights" in data:
+            df = select_table(data["flights"], columns=columns)
+        else:
+            df = read_table(data.get("flights_path", args.input_csv), columns=columns)
+        s["rows_out"] = len(df)
+    features = [f for f in FEATURES if f in df.columns]
+    train, valid = chronological_split(df, args.valid_fraction)
 
-    pred = model.predict(Xte)
-    mae = mean_absolute_error(yte, pred)
+    # Compact float32 matrices; DataFrames keep feature names for downstream scoring
+    Xtr = train[features].fillna(0).astype(np.float32)
+    ytr = train[TARGET].fillna(0).to_numpy(dtype=np.float32)
+    Xte = valid[features].fillna(0).astype(np.float32)
+    yte = valid[TARGET].fillna(0).to_numpy(dtype=np.float32)
 
-    joblib.dump(model, "models/delay_model.pkl")
-    print(f"Trained model saved to models/delay_model.pkl with Test MAE: {mae:.2f} minutes")
+    model = make_model(args)
+    with stage(run, "fit", rows_in=len(Xtr), features=len(features)):
+        t0 = time.perf_counter()
+        model.fit(Xtr, ytr)
+        fit_time = time.perf_counter() - t0
+
+    mae = None
+    if len(Xte):
+        with stage(run, "predict", rows_in=len(Xte)) as s:
+            t0 = time.perf_counter()
+            pred = model.predict(Xte)
+            predict_time = time.perf_counter() - t0
+            mae = float(mean_absolute_error(yte, pred))
+            s["mae"] = mae
+
+    if args.model_path:
+        with stage(run, "save"):
+            os.makedirs(os.path.dirname(args.model_path) or ".", exist_ok=True)
+            joblib.dump(model, args.model_path)
+    finish_run(run, rows_in=len(df), estimator=type(model).__name__, mae=mae)
+    print(f"Fit {type(model).__name__} on {len(Xtr):,} rows in {fit_time:.2f}s")
+    if mae is None:
+        print(f"Trained model saved to {args.model_path or 'memory'} without validation (--valid_fraction 0)")
+    else:
+        print(f"Predict {len(Xte) / max(predict_time, 1e-9):,.0f} rows/s")
+        print(f"Trained model saved to {args.model_path or 'memory'} with chronological validation MAE: {mae:.2f} minutes")
+    data["delay_model"] = model
+    return data
+
+def fraction(text):
+    """argparse type for a share in [0, 1)."""
+    value = float(text)
+    if not 0 <= value < 1:
+        raise argparse.ArgumentTypeError(f"{text} is not in [0, 1)")
+    return value
+
+def build_parser(parser=None):
+    """Command-line options (``python -m scripts`` passes its subcommand parser)."""
+    parser = parser or argparse.ArgumentParser()
+    parser.add_argument("--input_csv", default="data/normalized_week.csv", help="CSV or Parquet dataset")
+    parser.add_argument("--model_path", default="models/delay_model.pkl",
+                        help="Where to save the model ('' keeps it in memory for a chained optimize stage)")
+    parser.add_argument("--estimator", choices=["hist", "gbr"], default="hist",
+                        help="hist: multi-core histogram gradient boosting; gbr: the original GradientBoostingRegressor")
+    parser.add_argument("--max_iter", type=int, default=200, help="Boosting iterations (added on --warm_start)")
+    parser.add_argument("--valid_fraction", type=fraction, default=0.2,
+                        help="Most recent share of flights held out (0 trains on everything without validation)")
+    parser.add_argument("--warm_start", action="store_true",
+                        help="Continue training the saved histogram model on new data (e.g. a new week)")
+    add_arguments(parser)
+    return parser
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--input_csv", default="data/normalized_week.csv")
-    args = parser.parse_args()
-    main(args)
+    main(build_parser().parse_args())
@@ -1,129 +1,229 @@
 import argparse
 import json
 import pandas as pd
-
-try:
-    from ortools.sat.python import cp_model
-    ORTOOLS_AVAILABLE = True
-except Exception:
-    ORTOOLS_AVAILABLE = False
-
-def main(args):
-    df = pd.read_csv(args.input_csv)
+from scripts.artifacts import finalize, resolve_summary_path, summarize, write_artifact
+from scripts.capacity import (KINDS, UNLIMITED, add_windows, flight_usage, parse_mode_schedule, profile_tables,
+                              select_profiles)
+from scripts.model_builder import optimize_buckets, ortools_available
+from scripts.decompose import solve_decomposed
+from scripts.greedy import greedy_assign
+from scripts.reoptimize import reoptimize
+from scripts.rotations import rotation_precedences
+from scripts.solution_cache import cache_get, cache_put, problem_key
+from scripts.instrument import add_arguments, finish_run, log, stage, start_run
+from scripts.delay_scoring import SLOT_FEATURES, delay_cost_matrix, load_delay_model, model_features
+from scripts.storage import read_table, select_table, write_table
+
+INPUT_COLS = ["carrier", "tailnum", "origin", "dest", "sched_dep", "sched_arr", "act_dep", "dep_delay", "count", "roll_15", "roll_60"]
+
+def main(args, data=None):
+    """Optimize the schedule; chained stages hand over ``flights`` and ``delay_model`` in ``data``."""
+    data = {} if data is None else data
+    run = start_run("optimize", args)
+    delay_model = load_delay_model(args.delay_model) if args.delay_model else data.get("delay_model")
+    columns = INPUT_COLS
+    if delay_model is not None:
+        columns = INPUT_COLS + [f for f in model_features(delay_model) if f not in SLOT_FEATURES + INPUT_COLS]
+    filters = [("flightdate", "in", args.dates.split(","))] if args.dates else None
+    with stage(run, "read") as s:
+        if "flights" in data:
+            df = select_table(data["flights"], columns=columns, filters=filters)
+        else:
+            df = read_table(data.get("flights_path", args.input_csv), columns=columns, filters=filters)
+        s["rows_out"] = len(df)
 
     with open(args.airport_config) as f:
         cfgs = json.load(f)
 
-    profile_key = args.airport_profile.upper()
-    if profile_key not in cfgs:
-        raise KeyError(f"Airport profile '{args.airport_profile}' (normalized as '{profile_key}') not found in config. Available keys: {list(cfgs.keys())}")
-
-    cfg = cfgs[profile_key]
-
-    capacity_modes = cfg.get("capacity_modes", {})
-    default_mode = cfg.get("default_capacity_mode", "")
-    capacity_mode = args.capacity_mode or default_mode
-    if capacity_mode not in capacity_modes:
-        raise KeyError(f"Capacity mode '{capacity_mode}' not found in config capacity_modes keys: {list(capacity_modes.keys())}")
-
-    departures_per_hr = capacity_modes[capacity_mode]["departures"]
-    bucket = cfg.get("bucket_minutes", 5)
-    cap_per_bucket = max(1, int(departures_per_hr * bucket / 60))
-    window = cfg.get("window_plus_minus_min", 15)
-
-    print(f"Using capacity mode: {capacity_mode} with {departures_per_hr} departures per hour")
-    print(f"Capacity per {bucket}-minute bucket: {cap_per_bucket}")
-
-    df.columns = df.columns.str.lower()
-    df["sched_dep"] = pd.to_datetime(df["sched_dep"])
-    df["minute"] = df["sched_dep"].dt.hour * 60 + df["sched_dep"].dt.minute
-    df["min_lb"] = (df["minute"] - window).clip(lower=0)
-    df["min_ub"] = (df["minute"] + window).clip(upper=1439)
-    df["bucket_lb"] = (df["min_lb"] // bucket).astype(int)
-    df["bucket_ub"] = (df["min_ub"] // bucket).astype(int)
-
-    dfd = df.copy().reset_index(drop=True)
-    if dfd.empty:
-        raise SystemExit("No flights found in dataset.")
-
-    max_bucket = 1440 // bucket
-
-    if not ORTOOLS_AVAILABLE:
-        dfd["bucket_sched"] = (dfd["minute"] // bucket).astype(int)
-        alloc = {b: 0 for b in range(max_bucket)}
-        assign = []
-        for _, row in dfd.sort_values("bucket_sched").iterrows():
-            lb, ub = int(row["bucket_lb"]), int(row["bucket_ub"])
-            best_b, best_dist = None, 1e9
-            for b in range(lb, ub + 1):
-                dist = abs(b - row["bucket_sched"])
-                if alloc.get(b, 0) < cap_per_bucket and dist < best_dist:
-                    best_b, best_dist = b, dist
-            if best_b is None:
-                best_b = int(row["bucket_sched"])
-            alloc[best_b] = alloc.get(best_b, 0) + 1
-            assign.append(best_b)
-        dfd["bucket_opt"] = assign
-    else:
-        model = cp_model.CpModel()
-        X = {}
-        for i, row in dfd.iterrows():
-            for b in range(int(row["bucket_lb"]), int(row["bucket_ub"]) + 1):
-                X[(i, b)] = model.NewBoolVar(f"x_{i}_{b}")
-
-        for i, row in dfd.iterrows():
-            model.Add(sum(X[(i, b)] for b in range(int(row["bucket_lb"]), int(row["bucket_ub"]) + 1)) == 1)
-
-        dfd['date'] = dfd['sched_dep'].dt.date
-        dates = dfd['date'].unique()
-
-        for date in dates:
-            flights_on_date = dfd[dfd['date'] == date]
-            for b in range(max_bucket):
-                in_b = [X[(i, b)] for i, row in flights_on_date.iterrows()
-                        if (int(row["bucket_lb"]) <= b <= int(row["bucket_ub"])) and ((i, b) in X)]
-                if in_b:
-                    model.Add(sum(in_b) <= cap_per_bucket)
-
-        dev_terms = []
-        for i, row in dfd.iterrows():
-            sched_b = int(row["minute"] // bucket)
-            for b in range(int(row["bucket_lb"]), int(row["bucket_ub"]) + 1):
-                dev_terms.append(abs(b - sched_b) * X[(i, b)])
-        model.Minimize(sum(dev_terms))
-
-        solver = cp_model.CpSolver()
-        solver.parameters.max_time_in_seconds = 30.0
-        solver.parameters.num_search_workers = 8
-        solver.Solve(model)
-
-        chosen = []
-        for i, row in dfd.iterrows():
-            pick = None
-            for b in range(int(row["bucket_lb"]), int(row["bucket_ub"]) + 1):
-                if solver.Value(X[(i, b)]) == 1:
-                    pick = b
-                    break
-            if pick is None:
-                pick = int(row["minute"] // bucket)
-            chosen.append(pick)
-        dfd["bucket_opt"] = chosen
+    profiles = select_profiles(cfgs, args.airport_profile)
+    kinds = args.capacity_kinds.split(",")
+    schedule = parse_mode_schedule(args.capacity_schedule) if args.capacity_schedule else None
+    bucket, tables, modes = profile_tables(cfgs, profiles, kinds, args.capacity_mode, schedule)
+    for profile_key in profiles:
+        desc = ", ".join(f"{m // 60:02d}:{m % 60:02d} {mode}" for m, mode in modes[profile_key])
+        print(f"{profile_key}: capacity modes [{desc}]")
+        for kind, row in zip(kinds, tables[profile_key]):
+            limited = row[row < UNLIMITED]
+            if len(limited):
+                print(f"  {kind} per {bucket}-minute bucket: {limited.min()}-{limited.max()}")
+
+    with stage(run, "windows", rows_in=len(df)) as s:
+        df = add_windows(df, cfgs, profiles, bucket)
+
+        dfd = df.copy().reset_index(drop=True)
+        if dfd.empty:
+            raise SystemExit("No flights found in dataset.")
+
+        lb, ub = dfd["bucket_lb"].to_numpy(), dfd["bucket_ub"].to_numpy()
+        sched_bucket = (dfd["minute"] // bucket).to_numpy()
+        usage, capacity, resources = flight_usage(dfd, lb, ub, sched_bucket, bucket, tables, kinds)
+        s.update(rows_out=len(dfd), usage_rows=len(usage["flight"]), resources=len(resources))
+    print(f"{len(dfd)} flights load {len(usage['flight'])} capacity rows on {len(resources)} airport resources")
+
+    # Optional aircraft rotation constraints between consecutive legs of the same tail
+    precedences, penalty = None, 0
+    if args.rotations != "none":
+        with stage(run, "rotations", rows_in=len(dfd)) as s:
+            precedences = rotation_precedences(dfd, bucket, args.min_turn_minutes,
+                                               keep_scheduled=args.rotations == "hard")
+            s["precedences"] = len(precedences["prev"])
+        print(f"Linked {len(precedences['prev'])} aircraft turnarounds that a retiming could break ({args.rotations})")
+
+    # Optional delay-minimization term: predicted delay of every (flight, candidate bucket) pair
+    extra_costs, deviation_weight = None, 1
+    if delay_model is not None:
+        with stage(run, "score", rows_in=len(dfd)) as s:
+            extra_costs, score_stats = delay_cost_matrix(dfd, delay_model, bucket, weight=args.delay_weight)
+            s.update(score_stats)
+        deviation_weight = bucket
+        print(f"Scored {score_stats['pairs']} candidate slots ({score_stats['unique_rows']} distinct feature rows) "
+              f"in {score_stats['score_time']:.2f}s")
+
+    if args.rotations == "soft":
+        penalty = int(round(args.rotation_penalty * deviation_weight))
+    rotation_args = {"precedences": precedences, "precedence_penalty": penalty}
+
+    with stage(run, "optimize", rows_in=len(dfd)) as s:
+        if args.previous_csv:
+            previous = read_table(args.previous_csv)
+            chosen, summary = reoptimize(dfd, previous, bucket, usage, capacity, time_limit=args.time_limit,
+                                         workers=args.workers, extra_costs=extra_costs,
+                                         deviation_weight=deviation_weight, **rotation_args)
+            print(f"Re-optimized {summary['free']} of {summary['flights']} flights ({summary['changed']} new or changed, "
+                  f"{summary['relaxed']} able to return) on {summary['dirty_days']} dates in {summary['solve_time']:.2f}s"
+                  f" [status {summary.get('status', 'UNCHANGED')}]")
+            if summary.get("fallback"):
+                print(f"Warning: no solution found ({summary['status']}) even after re-solving whole dates; "
+                      f"their flights were placed by the greedy scheduler")
+            elif summary.get("status") == "FEASIBLE":
+                print("Warning: time limit reached before proving optimality for the re-solved flights")
+            s.update(method="reoptimize", **summary)
+            dfd["bucket_opt"] = chosen
+        elif not ortools_available():
+            dfd["bucket_opt"] = greedy_assign(lb, ub, sched_bucket, usage, capacity, precedences)
+            s.update(method="greedy", status="GREEDY")
+        elif args.decompose != "none":
+            chosen, summary = solve_decomposed(
+                dfd, bucket, usage, capacity, time_limit=args.time_limit, processes=args.processes,
+                by_origin=args.decompose == "date_origin", max_flights=args.max_flights_per_model,
+                window_hours=args.window_hours, overlap_hours=args.overlap_hours, warm_start=args.warm_start,
+                extra_costs=extra_costs, deviation_weight=deviation_weight, cache_dir=args.cache_dir,
+                cache_max_mb=args.cache_max_mb, **rotation_args)
+            if summary["cache_hits"]:
+                print(f"Reused {summary['cache_hits']} of {summary['subproblems']} subproblems from the solution cache")
+            print(f"Solved {summary['subproblems']} subproblems ({summary['models']} models) in {summary['wall_time']:.2f}s "
+                  f"[build {summary['build_time']:.2f}s, solve {summary['solve_time']:.2f}s, status {summary['status']}]")
+            unsolved = sum(n for status, n in summary["status"].items() if status not in ("OPTIMAL", "FEASIBLE"))
+            if unsolved:
+                print(f"Warning: {unsolved} models found no solution; their flights were placed by the greedy scheduler")
+            elif summary["status"].get("FEASIBLE"):
+                print(f"Warning: {summary['status']['FEASIBLE']} models hit the time limit (worst gap {summary['gap']:.1%})")
+            s.update(method="decompose", **summary)
+            dfd["bucket_opt"] = chosen
+        else:
+            key = problem_key(lb, ub, sched_bucket, usage, capacity, extra_costs, precedences, solver="cp_sat",
+                              time_limit=args.time_limit, warm_start=args.warm_start,
+                              deviation_weight=deviation_weight, precedence_penalty=penalty) if args.cache_dir else None
+            hit = cache_get(args.cache_dir, key)
+            if hit is not None:
+                chosen, stats = hit
+                print(f"Reused cached solution {key[:12]} (status {stats['status']}); skipped model building")
+                s.update(method="cache", status=stats["status"], objective=stats["objective"])
+            else:
+                hint = None
+                if args.warm_start:
+                    hint = greedy_assign(lb, ub, sched_bucket, usage, capacity, precedences)
+                chosen, stats = optimize_buckets(lb, ub, sched_bucket, usage, capacity,
+                                                 time_limit=args.time_limit, workers=args.workers, hint=hint,
+                                                 extra_costs=extra_costs, deviation_weight=deviation_weight,
+                                                 **rotation_args)
+                print(f"Built model with {stats['num_vars']} variables, {stats['num_capacity_constraints']} capacity "
+                      f"and {stats['num_precedence_constraints']} rotation constraints in {stats['build_time']:.2f}s")
+                print(f"Solver status {stats['status']} after {stats['solve_time']:.2f}s")
+                if stats["status"] == "FEASIBLE":
+                    print(f"Warning: time limit reached before proving optimality (objective {stats['objective']:.0f}, "
+                          f"bound {stats['bound']:.0f}, gap {stats['gap']:.1%})")
+                elif stats["status"] != "OPTIMAL":
+                    print(f"Warning: no solution found ({stats['status']}); flights keep their scheduled buckets")
+                log(run, "build", wall_s=round(stats["build_time"], 4), rows_in=len(dfd), num_vars=stats["num_vars"],
+                    num_capacity_constraints=stats["num_capacity_constraints"],
+                    num_precedence_constraints=stats["num_precedence_constraints"])
+                log(run, "solve", wall_s=round(stats["solve_time"], 4),
+                    **{k: stats[k] for k in ("status", "objective", "bound", "gap", "wall_time")})
+                s.update(method="cp_sat", status=stats["status"])
+                if stats["status"] in ("OPTIMAL", "FEASIBLE"):
+                    cache_put(args.cache_dir, key, chosen, stats, args.cache_max_mb)
+            dfd["bucket_opt"] = chosen
 
     dfd["opt_minute"] = dfd["bucket_opt"] * bucket + bucket // 2
     dfd["opt_dep"] = pd.to_datetime(dfd["sched_dep"].dt.date.astype(str)) + pd.to_timedelta(dfd["opt_minute"], unit="m")
 
     out_cols = ["carrier", "tailnum", "origin", "dest", "sched_dep", "act_dep", "dep_delay", "count", "roll_15", "roll_60", "opt_dep"]
-    out = dfd[out_cols].copy()
-    out.to_csv(args.output_csv, index=False)
-
-    print(f"Optimized schedule saved → {args.output_csv}")
+    if "sched_arr" in dfd.columns:
+        # Arrivals move with the departure
+        dfd["opt_arr"] = dfd["sched_arr"] + (dfd["opt_dep"] - dfd["sched_dep"])
+        out_cols = out_cols[:5] + ["sched_arr"] + out_cols[5:] + ["opt_arr"]
+    out = dfd[[c for c in out_cols if c in dfd.columns]].copy()
+    if args.output_csv:
+        with stage(run, "write", rows_out=len(out)):
+            write_table(out, args.output_csv)
+    artifact_path = resolve_summary_path(args.summary_path, args.output_csv)
+    if artifact_path:
+        with stage(run, "summary", rows_in=len(out)):
+            write_artifact(finalize(summarize(out, bucket), "optimize", bucket), artifact_path)
+        print(f"Dashboard summary → {artifact_path}")
+    finish_run(run, rows_out=len(out), shifted=int((dfd["bucket_opt"] != sched_bucket).sum()))
+
+    print(f"Optimized schedule saved → {args.output_csv or 'memory'}")
+    data["schedule"] = out
+    return data
+
+def build_parser(parser=None):
+    """Command-line options (``python -m scripts`` passes its subcommand parser)."""
+    parser = parser or argparse.ArgumentParser()
+    parser.add_argument("--input_csv", default="data/normalized_week.csv", help="CSV or Parquet dataset")
+    parser.add_argument("--dates", default=None, help="Optional comma-separated FlightDate values to optimize")
+    parser.add_argument("--airport_config", default="configs/airports.json")
+    parser.add_argument("--airport_profile", default="JFK",
+                        help="Airport profile, comma-separated profiles or 'all' to plan the network in one run")
+    parser.add_argument("--capacity_mode", default=None, help="Optional capacity mode to use all day")
+    parser.add_argument("--capacity_schedule", default=None,
+                        help="Time-of-day capacity modes, e.g. '00:00=Instrument,07:00=Visual_DeparturePriority'")
+    parser.add_argument("--capacity_kinds", default=",".join(KINDS),
+                        help="Capacity limits to enforce: departures at origin, arrivals at dest, movements at both")
+    parser.add_argument("--output_csv", default="data/optimized_schedule.csv",
+                        help="CSV or .parquet output ('' keeps the schedule in memory for a chained stage)")
+    parser.add_argument("--time_limit", type=float, default=30.0, help="CP-SAT time budget in seconds")
+    parser.add_argument("--workers", type=int, default=8, help="CP-SAT search workers")
+    parser.add_argument("--previous_csv", default=None,
+                        help="Previous optimized_schedule.csv; only dates/buckets invalidated by the new capacity or flights are re-solved")
+    parser.add_argument("--rotations", choices=["none", "hard", "soft"], default="none",
+                        help="Keep each aircraft's next leg after its retimed arrival plus the minimum turnaround "
+                             "(hard: constraint, soft: objective penalty)")
+    parser.add_argument("--min_turn_minutes", type=int, default=30, help="Minimum turnaround between legs of a tail")
+    parser.add_argument("--rotation_penalty", type=float, default=10.0,
+                        help="Soft rotations: cost per bucket of missed turnaround, relative to one bucket of deviation")
+    parser.add_argument("--delay_model", default=None,
+                        help="Model from 1_train_model.py (default: the model of a chained train stage); "
+                             "adds predicted delay of each candidate slot to the objective")
+    parser.add_argument("--delay_weight", type=float, default=1.0,
+                        help="Objective weight per predicted delay minute (deviation costs 1 per minute shifted)")
+    parser.add_argument("--warm_start", action="store_true",
+                        help="Seed CP-SAT with the greedy assignment as solution hints")
+    parser.add_argument("--decompose", choices=["none", "date", "date_origin"], default="none",
+                        help="Solve independent per-date (and per-origin) subproblems in a process pool")
+    parser.add_argument("--processes", type=int, default=None, help="Process pool size for --decompose")
+    parser.add_argument("--max_flights_per_model", type=int, default=0,
+                        help="Split a subproblem into overlapping time windows above this many flights (0 = never)")
+    parser.add_argument("--window_hours", type=float, default=4, help="Window length when splitting a day")
+    parser.add_argument("--overlap_hours", type=float, default=1, help="Overlap between consecutive windows")
+    parser.add_argument("--cache_dir", default=None,
+                        help="Reuse solutions of unchanged problems (per subproblem with --decompose) from this directory")
+    parser.add_argument("--cache_max_mb", type=float, default=512, help="Evict least recently used cache entries beyond this size")
+    parser.add_argument("--summary_path", default=None,
+                        help="Compact per-(date, airport) dashboard summary (default: <output>.summary.json.gz; '' to skip)")
+    add_arguments(parser)
+    return parser
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--input_csv", default="data/normalized_week.csv")
-    parser.add_argument("--airport_config", default="configs/airports.json")
-    parser.add_argument("--airport_profile", default="JFK")
-    parser.add_argument("--capacity_mode", default=None, help="Optional capacity mode to select")
-    parser.add_argument("--output_csv", default="data/optimized_schedule.csv")
-    args = parser.parse_args()
-    main(args)
+    main(build_parser().parse_args())
@@ -0,0 +1,140 @@
+import argparse
+import json
+import os
+import sys
+import time
+import pandas as pd
+from scripts.capacity import KINDS, parse_mode_schedule, profile_tables, select_profiles
+from scripts.instrument import add_arguments, finish_run, stage, start_run
+from scripts.rolling_horizon import apply_updates, evict, initial_state, parse_updates, replan
+from scripts.storage import read_table, select_table, write_table
+
+INPUT_COLS = ["carrier", "tailnum", "origin", "dest", "sched_dep", "sched_arr", "act_dep"]
+
+def read_batches(args):
+    """Yield lists of JSON lines: stdin line by line, or one batch per new file in --watch_dir."""
+    if not args.watch_dir:
+        for line in sys.stdin:
+            yield [line]
+        return
+    seen = set()
+    while True:
+        names = sorted(n for n in os.listdir(args.watch_dir) if n.endswith(".jsonl") and n not in seen)
+        for name in names:
+            seen.add(name)
+            with open(os.path.join(args.watch_dir, name)) as f:
+                yield f.readlines()
+        if args.once and not names:
+            return
+        if not names:
+            time.sleep(args.poll_seconds)
+
+def emit(diff, out):
+    """One JSON line per changed flight: its key (``key_dep``), current ``sched_dep`` and old / new ``opt_dep``."""
+    for row in diff.to_dict("records"):
+        out.write(json.dumps({k: (v.isoformat() if isinstance(v, pd.Timestamp) else None if pd.isna(v) else v)
+                              for k, v in row.items()}) + "\n")
+    out.flush()
+
+def main(args, data=None):
+    """Serve replans until the update stream ends; chained stages hand over ``flights`` and ``schedule``."""
+    data = {} if data is None else data
+    metrics = start_run("replan", args)
+    with open(args.airport_config) as f:
+        cfgs = json.load(f)
+    profiles = select_profiles(cfgs, args.airport_profile)
+    kinds = args.capacity_kinds.split(",")
+    schedule = parse_mode_schedule(args.capacity_schedule) if args.capacity_schedule else None
+    bucket, tables, _ = profile_tables(cfgs, profiles, kinds, args.capacity_mode, schedule)
+
+    filters = [("flightdate", "in", args.dates.split(","))] if args.dates else None
+    if "flights" in data:
+        flights = select_table(data["flights"], columns=INPUT_COLS, filters=filters)
+    elif data.get("flights_path") or args.input_csv:
+        flights = read_table(data.get("flights_path") or args.input_csv, columns=INPUT_COLS, filters=filters)
+    else:
+        flights = pd.DataFrame(columns=INPUT_COLS)
+    previous = read_table(args.previous_csv) if args.previous_csv else data.get("schedule")
+    state = initial_state(flights, previous)
+
+    if args.start:
+        now = pd.Timestamp(args.start)
+    elif args.clock == "wall":
+        now = pd.Timestamp.now()
+    else:
+        now = state["sched_dep"].min() if len(state) else pd.Timestamp.now()
+    out = open(args.diff_path, "a") if args.diff_path else sys.stdout
+    print(f"Holding {len(state)} flights; clock starts at {now}", file=sys.stderr)
+
+    def run(now):
+        nonlocal state
+        with stage(metrics, "replan") as m:
+            state = evict(state, now)
+            state, diff, stats = replan(state, now, cfgs, profiles, bucket, tables, kinds,
+                                        horizon_minutes=args.horizon_hours * 60, freeze_minutes=args.freeze_minutes,
+                                        latency_budget=args.latency_budget, workers=args.workers,
+                                        rotations=args.rotations, min_turn_minutes=args.min_turn_minutes,
+                                        rotation_penalty=args.rotation_penalty,
+                                        stability_weight=args.stability_weight)
+            emit(diff, out)
+            m.update(stats)
+        print(json.dumps(stats), file=sys.stderr)
+
+    run(now)
+    last_plan, pending = now, 0
+    for lines in read_batches(args):
+        upd, tick, requested = parse_updates(lines)
+        state, touched = apply_updates(state, upd)
+        pending += touched
+        if args.clock == "wall":
+            now = pd.Timestamp.now()
+        elif tick is not None:
+            now = max(now, tick)
+        due = now - last_plan >= pd.Timedelta(minutes=args.replan_minutes)
+        if requested or args.watch_dir or (pending and due) or (args.clock == "stream" and due):
+            run(now)
+            last_plan, pending = now, 0
+    if pending:
+        run(now)
+
+    if args.output_csv:
+        write_table(state.reset_index(), args.output_csv)
+        print(f"Current plan saved → {args.output_csv}", file=sys.stderr)
+    finish_run(metrics, flights=len(state), replans=sum(r["stage"] == "replan" for r in metrics["records"]))
+    data["plan"] = state
+    return data
+
+def build_parser(parser=None):
+    """Command-line options (``python -m scripts`` passes its subcommand parser)."""
+    parser = parser or argparse.ArgumentParser()
+    parser.add_argument("--input_csv", default=None, help="Initial schedule (CSV or Parquet); flights may also arrive only via the stream")
+    parser.add_argument("--dates", default=None, help="Optional comma-separated FlightDate values to load")
+    parser.add_argument("--previous_csv", default=None, help="Optimized schedule to start from (its opt_dep values)")
+    parser.add_argument("--airport_config", default="configs/airports.json")
+    parser.add_argument("--airport_profile", default="JFK", help="Airport profile, comma-separated profiles or 'all'")
+    parser.add_argument("--capacity_mode", default=None, help="Optional capacity mode to use all day")
+    parser.add_argument("--capacity_schedule", default=None, help="Time-of-day capacity modes, e.g. '00:00=Instrument,07:00=Marginal'")
+    parser.add_argument("--capacity_kinds", default=",".join(KINDS))
+    parser.add_argument("--watch_dir", default=None, help="Read update batches from new *.jsonl files here instead of stdin")
+    parser.add_argument("--poll_seconds", type=float, default=5.0, help="Polling interval for --watch_dir")
+    parser.add_argument("--once", action="store_true", help="With --watch_dir: stop when no new files are left")
+    parser.add_argument("--clock", choices=["stream", "wall"], default="stream",
+                        help="stream: time advances with the records' 'now' field (replay); wall: system time")
+    parser.add_argument("--start", default=None, help="Initial clock value (default: first scheduled departure)")
+    parser.add_argument("--horizon_hours", type=float, default=3, help="Length of the open planning window")
+    parser.add_argument("--freeze_minutes", type=int, default=0, help="Do not retime flights departing sooner than this")
+    parser.add_argument("--replan_minutes", type=float, default=5, help="Minimum clock time between replans")
+    parser.add_argument("--latency_budget", type=float, default=5.0, help="Seconds per replan, model building included")
+    parser.add_argument("--workers", type=int, default=8, help="CP-SAT search workers")
+    parser.add_argument("--rotations", choices=["none", "hard", "soft"], default="none")
+    parser.add_argument("--min_turn_minutes", type=int, default=30)
+    parser.add_argument("--rotation_penalty", type=int, default=10)
+    parser.add_argument("--stability_weight", type=int, default=2,
+                        help="Cost per bucket of moving a flight away from its published opt_dep")
+    parser.add_argument("--diff_path", default=None, help="Append opt_dep diffs (JSON lines) here instead of stdout")
+    parser.add_argument("--output_csv", default=None, help="Write the full current plan on exit")
+    add_arguments(parser)
+    return parser
+
+if __name__ == "__main__":
+    main(build_parser().parse_args())
@@ -0,0 +1,74 @@
+"""Pipeline CLI: ``python -m scripts <stage> [options] [+ <stage> [options] ...]``.
+
+Only the chosen stages' modules are imported, so ``--help`` and light stages start fast. Stages
+joined with ``+`` run in one process and hand the prepared flights, the trained delay model and
+the optimized schedule to the next stage in memory; pass ``--output_csv ''`` / ``--model_path ''``
+to skip writing intermediate results. A chunked prepare (``--chunksize``) hands over the path it
+wrote instead, which the next stage reads in place of its ``--input_csv``.
+"""
+import argparse
+import importlib
+import os
+import sys
+
+STAGES = {
+    "prepare": ("scripts.0_prepare_bts", "Clean a raw BTS download and add demand features"),
+    "train": ("scripts.1_train_model", "Fit the delay prediction model"),
+    "optimize": ("scripts.2_optimize_schedule", "Assign flights to capacity-feasible departure buckets"),
+    "replan": ("scripts.3_replan_stream", "Rolling-horizon replanning from a stream of flight updates"),
+    "serve": (None, "Launch the Streamlit dashboard (remaining options go to 'streamlit run')"),
+}
+SEPARATOR = "+"
+
+def usage():
+    lines = [f"usage: python -m scripts <stage> [options] [{SEPARATOR} <stage> [options] ...]", "", "stages:"]
+    lines += [f"  {name:<10} {desc}" for name, (_, desc) in STAGES.items()]
+    lines += ["", "Run 'python -m scripts <stage> --help' for the options of one stage."]
+    return "\n".join(lines)
+
+def split_chain(argv):
+    """['prepare', '--x', '1', '+', 'train'] -> [['prepare', '--x', '1'], ['train']]."""
+    chain = [[]]
+    for arg in argv:
+        if arg == SEPARATOR:
+            chain.append([])
+        else:
+            chain[-1].append(arg)
+    return [part for part in chain if part]
+
+def serve(argv):
+    from streamlit.web import cli
+
+    app = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+    sys.argv = ["streamlit", "run", app, *argv]
+    sys.exit(cli.main())
+
+def main(argv=None):
+    chain = split_chain(sys.argv[1:] if argv is None else argv)
+    if not chain or chain[0][0] in ("-h", "--help"):
+        print(usage())
+        return
+    for k, (name, *_) in enumerate(chain):
+        if name not in STAGES:
+            raise SystemExit(f"Unknown stage '{name}'\n\n{usage()}")
+        if name == "serve" and k != len(chain) - 1:
+            raise SystemExit("'serve' must be the last stage of a chain")
+
+    # Parse every stage's options before running anything, so a typo does not fail an hour in
+    stages = []
+    for name, *rest in chain:
+        module_name, desc = STAGES[name]
+        if module_name is None:
+            continue
+        module = importlib.import_module(module_name)
+        parser = module.build_parser(argparse.ArgumentParser(prog=f"python -m scripts {name}", description=desc))
+        stages.append((module, parser.parse_args(rest)))
+
+    data = {}
+    for module, args in stages:
+        data = module.main(args, data)
+    if chain[-1][0] == "serve":
+        serve(chain[-1][1:])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+from scripts.utils import busiest_windows, minute_of_day
+
+DELAY_CAUSE_COLS = ["carrierdelay", "weatherdelay", "nasdelay", "securitydelay", "lateaircraftdelay"]
+
+def bucket_counts(ts, bucket_minutes=5):
+    """Flights per bucket of the day (only non-empty buckets, in bucket order)."""
+    bucket = (minute_of_day(ts).dropna() // bucket_minutes).astype(int)
+    counts = np.bincount(bucket, minlength=1440 // bucket_minutes)
+    nonzero = np.flatnonzero(counts)
+    return pd.Series(counts[nonzero], index=nonzero)
+
+def histogram(values, bins=50):
+    """Histogram as plain lists so it can be cached or serialized."""
+    values = pd.Series(values).dropna().to_numpy(dtype=float)
+    if len(values) == 0:
+        return {"counts": [], "edges": []}
+    counts, edges = np.histogram(values, bins=bins)
+    return {"counts": counts.tolist(), "edges": edges.tolist()}
+
+def day_aggregates(raw_day, opt_day=None, bucket_minutes=5, capacity_per_bucket=None, window_buckets=6):
+    """Everything the dashboard draws for one date, computed once from the per-flight rows."""
+    out = {"rows": len(raw_day), "opt_rows": 0 if opt_day is None else len(opt_day)}
+    out["busiest"] = busiest_windows(raw_day, bucket_minutes=bucket_minutes, window_buckets=window_buckets)
+    out["sched_counts"] = bucket_counts(raw_day["sched_dep"], bucket_minutes)
+    out["delay_hist"] = histogram(raw_day["dep_delay"]) if "dep_delay" in raw_day.columns else histogram([])
+    if all(col in raw_day.columns for col in DELAY_CAUSE_COLS):
+        out["delay_causes"] = raw_day[DELAY_CAUSE_COLS].describe().T
+    if "cancelled" in raw_day.columns:
+        out["cancelled"] = raw_day["cancelled"].value_counts()
+
+    if opt_day is not None and len(opt_day):
+        out["opt_counts"] = bucket_counts(opt_day["opt_dep"], bucket_minutes)
+        out["shift_hist"] = histogram((opt_day["opt_dep"] - opt_day["sched_dep"]).dt.total_seconds() / 60)
+    if capacity_per_bucket is not None:
+        out["over_capacity_before"] = int((out["sched_counts"] > capacity_per_bucket).sum())
+        if "opt_counts" in out:
+            out["over_capacity_after"] = int((out["opt_counts"] > capacity_per_bucket).sum())
+    return out
@@ -0,0 +1,193 @@
+import gzip
+import json
+import numpy as np
+import pandas as pd
+from scripts.aggregates import DELAY_CAUSE_COLS
+from scripts.utils import minute_of_day
+
+ARTIFACT_VERSION = 1
+# Fixed bin edges (minutes) so histograms of chunks, airports and days can be summed; outliers
+# land in the outer bins
+DELAY_EDGES = np.arange(-60, 361, 10)
+SHIFT_EDGES = np.arange(-120, 121, 5)
+TOP_N = 12
+
+def summary_path(output_path):
+    """Default artifact path next to a CSV / Parquet output: ``data/x.csv`` -> ``data/x.summary.json.gz``."""
+    base = str(output_path).rstrip("/")
+    for ext in (".csv", ".parquet"):
+        if base.endswith(ext):
+            base = base[:-len(ext)]
+            break
+    return base + ".summary.json.gz"
+
+def resolve_summary_path(summary_arg, output_path):
+    """``--summary_path`` value, defaulting to a path next to the output ('' or no output: no artifact)."""
+    if summary_arg is not None:
+        return summary_arg or None
+    return summary_path(output_path) if output_path else None
+
+def _binned(values, edges):
+    values = np.asarray(values, dtype=float)
+    return np.histogram(np.clip(values[~np.isnan(values)], edges[0], edges[-1]), bins=edges)[0]
+
+def summarize(df, bucket_minutes=5):
+    """Summable per-(date, airport) aggregates of prepared or optimized flights.
+
+    Returns ``{(date, origin): entry}`` with dense bucket counts before (and after, when ``opt_dep``
+    is present), fixed-bin delay and shift histograms, delay-cause sums and cancellations. Partial
+    summaries of chunks combine with ``merge_summaries``; ``finalize`` makes them serializable.
+    """
+    cols = {c.lower(): c for c in df.columns}
+    sched = pd.to_datetime(df[cols["sched_dep"]])
+    airport = df[cols["origin"]].astype(str) if "origin" in cols else pd.Series("", index=df.index)
+    num_buckets = 1440 // bucket_minutes
+    bucket = (minute_of_day(sched) // bucket_minutes).fillna(-1).to_numpy(dtype=np.int64)
+    opt = pd.to_datetime(df[cols["opt_dep"]]) if "opt_dep" in cols else None
+    if opt is not None:
+        opt_bucket = (minute_of_day(opt) // bucket_minutes).fillna(-1).to_numpy(dtype=np.int64)
+        shift = ((opt - sched).dt.total_seconds() / 60).to_numpy()
+    delay = df[cols["dep_delay"]].to_numpy(dtype=float) if "dep_delay" in cols else None
+    causes = [c for c in DELAY_CAUSE_COLS if c in cols]
+    cancelled = df[cols["cancelled"]].fillna(0).to_numpy(dtype=float) if "cancelled" in cols else None
+
+    out = {}
+    for (day, origin), rows in df.groupby([sched.dt.normalize().to_numpy(), airport.to_numpy()], sort=True).indices.items():
+        b = bucket[rows]
+        entry = {"rows": len(rows), "sched_counts": np.bincount(b[b >= 0], minlength=num_buckets)}
+        if opt is not None:
+            ob = opt_bucket[rows]
+            entry["opt_counts"] = np.bincount(ob[ob >= 0], minlength=num_buckets)
+            entry["shift_hist"] = _binned(shift[rows], SHIFT_EDGES)
+        if delay is not None:
+            entry["delay_hist"] = _binned(delay[rows], DELAY_EDGES)
+        if causes:
+            values = df[[cols[c] for c in causes]].iloc[rows].to_numpy(dtype=float)
+            entry["delay_causes"] = {c: np.array([np.sum(~np.isnan(v)), np.nansum(v), np.sum(v > 0),
+                                                  np.nanmax(v, initial=0)]) for c, v in zip(causes, values.T)}
+        if cancelled is not None:
+            entry["cancelled"] = int((cancelled[rows] > 0).sum())
+        out[(pd.Timestamp(day).strftime("%Y-%m-%d"), origin)] = entry
+    return out
+
+def _merge_causes(a, b):
+    """Combine per-cause [count, sum, delayed count, max] arrays."""
+    out = dict(a)
+    for cause, v in b.items():
+        v = np.asarray(v, dtype=float)
+        if cause in out:
+            w = out[cause]
+            v = np.concatenate([w[:3] + v[:3], [max(w[3], v[3])]])
+        out[cause] = v
+    return out
+
+def _merge_entry(a, b):
+    merged = dict(a)
+    for key, value in b.items():
+        if key not in merged:
+            merged[key] = value
+        elif key == "delay_causes":
+            merged[key] = _merge_causes(merged[key], value)
+        else:
+            merged[key] = merged[key] + value
+    return merged
+
+def merge_summaries(total, part):
+    """Add the per-(date, airport) aggregates of ``part`` into ``total`` (in place) and return it."""
+    for key, entry in part.items():
+        total[key] = _merge_entry(total[key], entry) if key in total else entry
+    return total
+
+def busiest(counts, bucket_minutes=5, window_buckets=6, top_n=TOP_N):
+    """Top-N trailing windows of ``window_buckets`` by flight count, like ``utils.busiest_windows``."""
+    counts = np.asarray(counts)
+    csum = np.concatenate(([0], np.cumsum(counts)))
+    ends = np.arange(len(counts))
+    window = csum[ends + 1] - csum[np.maximum(ends + 1 - window_buckets, 0)]
+    top = [int(b) for b in np.argsort(-window, kind="stable")[:top_n] if window[b] > 0]
+    return [{"bucket": b, "window_count": int(window[b]), "window_start_minute": b * bucket_minutes} for b in top]
+
+def _sparse(counts):
+    nonzero = np.flatnonzero(counts)
+    return {"bucket": nonzero.tolist(), "count": np.asarray(counts)[nonzero].tolist()}
+
+def finalize(summary, kind, bucket_minutes=5, top_n=TOP_N):
+    """JSON-ready artifact: sparse bucket counts, histogram lists and the top-N busiest windows."""
+    days = {}
+    for (day, origin), entry in summary.items():
+        item = {"rows": int(entry["rows"]), "sched_counts": _sparse(entry["sched_counts"]),
+                "busiest": busiest(entry["sched_counts"], bucket_minutes, top_n=top_n)}
+        if "opt_counts" in entry:
+            item["opt_counts"] = _sparse(entry["opt_counts"])
+            item["shift_hist"] = entry["shift_hist"].tolist()
+        if "delay_hist" in entry:
+            item["delay_hist"] = entry["delay_hist"].tolist()
+        if "delay_causes" in entry:
+            item["delay_causes"] = {c: [float(x) for x in v] for c, v in entry["delay_causes"].items()}
+        if "cancelled" in entry:
+            item["cancelled"] = int(entry["cancelled"])
+        days.setdefault(day, {})[origin] = item
+    return {"version": ARTIFACT_VERSION, "kind": kind, "bucket_minutes": bucket_minutes,
+            "delay_edges": DELAY_EDGES.tolist(), "shift_edges": SHIFT_EDGES.tolist(), "days": days}
+
+def write_artifact(artifact, path):
+    with gzip.open(path, "wt") as f:
+        json.dump(artifact, f, separators=(",", ":"))
+
+def read_artifact(path_or_file):
+    """Load an artifact from a path or an uploaded file object."""
+    with gzip.open(path_or_file, "rt") as f:
+        artifact = json.load(f)
+    if artifact.get("version") != ARTIFACT_VERSION:
+        raise ValueError(f"Unsupported summary artifact version {artifact.get('version')}")
+    return artifact
+
+def _dense(sparse, num_buckets):
+    counts = np.zeros(num_buckets, dtype=np.int64)
+    counts[sparse["bucket"]] = sparse["count"]
+    return counts
+
+def artifact_aggregates(prepared, optimized, date, airports=None, capacity_per_bucket=None, window_buckets=6):
+    """Dashboard aggregates for one date (summed over ``airports``, default all) from the artifacts
+    of the prepare and optimize stages, in the shape ``aggregates.day_aggregates`` returns."""
+    bucket_minutes = (prepared or optimized)["bucket_minutes"]
+    num_buckets = 1440 // bucket_minutes
+    day = str(date)
+    raw = {a: e for a, e in (prepared or optimized)["days"].get(day, {}).items() if airports is None or a in airports}
+    opt = {} if optimized is None else \
+        {a: e for a, e in optimized["days"].get(day, {}).items() if airports is None or a in airports}
+
+    def total(entries, key):
+        return sum((_dense(e[key], num_buckets) for e in entries.values() if key in e), np.zeros(num_buckets, dtype=np.int64))
+
+    def hist(entries, key, edges):
+        counts = sum((np.asarray(e[key]) for e in entries.values() if key in e), np.zeros(len(edges) - 1, dtype=np.int64))
+        return {"counts": counts.tolist() if counts.any() else [], "edges": list(edges)}
+
+    sched = total(raw, "sched_counts")
+    nonzero = np.flatnonzero(sched)
+    out = {"rows": sum(e["rows"] for e in raw.values()), "opt_rows": sum(e["rows"] for e in opt.values()),
+           "sched_counts": pd.Series(sched[nonzero], index=nonzero),
+           "busiest": pd.DataFrame(busiest(sched, bucket_minutes, window_buckets),
+                                   columns=["bucket", "window_count", "window_start_minute"]),
+           "delay_hist": hist(raw, "delay_hist", (prepared or optimized)["delay_edges"])}
+    causes = {}
+    for e in raw.values():
+        causes = _merge_causes(causes, e.get("delay_causes", {}))
+    if causes:
+        out["delay_causes"] = pd.DataFrame(
+            {cause: {"count": n, "mean": total_min / n if n else 0.0, "share_delayed": delayed / n if n else 0.0,
+                     "max": peak} for cause, (n, total_min, delayed, peak) in causes.items()}).T
+    if any("cancelled" in e for e in raw.values()):
+        cancelled = sum(e.get("cancelled", 0) for e in raw.values())
+        out["cancelled"] = pd.Series({0.0: out["rows"] - cancelled, 1.0: cancelled}, name="count")
+    if opt:
+        after = total(opt, "opt_counts")
+        nonzero = np.flatnonzero(after)
+        out["opt_counts"] = pd.Series(after[nonzero], index=nonzero)
+        out["shift_hist"] = hist(opt, "shift_hist", optimized["shift_edges"])
+    if capacity_per_bucket is not None:
+        out["over_capacity_before"] = int((out["sched_counts"] > capacity_per_bucket).sum())
+        if "opt_counts" in out:
+            out["over_capacity_after"] = int((out["opt_counts"] > capacity_per_bucket).sum())
+    return out
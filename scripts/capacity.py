@@ -0,0 +1,190 @@
+import numpy as np
+import pandas as pd
+
+KINDS = ["departures", "arrivals", "movements"]
+# Capacity used for slots without a configured limit (never binding)
+UNLIMITED = 1 << 30
+
+def parse_mode_schedule(text):
+    """Parse '00:00=Instrument,07:00=Visual_DeparturePriority' into [(minute, mode), ...]."""
+    entries = []
+    for item in text.split(","):
+        start, mode = item.split("=")
+        h, m = start.strip().split(":")
+        entries.append((int(h) * 60 + int(m), mode.strip()))
+    return sorted(entries)
+
+def mode_schedule(cfg, capacity_mode=None, schedule=None):
+    """Time-of-day capacity modes for one airport profile as sorted [(start_minute, mode), ...].
+
+    Precedence: an explicit ``schedule``, then a single ``capacity_mode``, then the profile's
+    ``capacity_mode_schedule`` and finally its ``default_capacity_mode``. A schedule that does not
+    start at 00:00 wraps around, i.e. the last mode of the day is still in force after midnight.
+    """
+    if schedule:
+        entries = list(schedule)
+    elif capacity_mode:
+        entries = [(0, capacity_mode)]
+    elif cfg.get("capacity_mode_schedule"):
+        entries = parse_mode_schedule(",".join(f"{e['start']}={e['mode']}" for e in cfg["capacity_mode_schedule"]))
+    else:
+        entries = [(0, cfg.get("default_capacity_mode", ""))]
+    capacity_modes = cfg.get("capacity_modes", {})
+    for _, mode in entries:
+        if mode not in capacity_modes:
+            raise KeyError(f"Capacity mode '{mode}' not found in config capacity_modes keys: {list(capacity_modes.keys())}")
+    return entries
+
+def capacity_table(cfg, modes, bucket, kinds=KINDS):
+    """Capacity per bucket of the day, shape (len(kinds), 1440 // bucket), from a mode schedule.
+
+    Hourly rates become ``max(1, int(rate * bucket / 60))`` per bucket; kinds missing from a mode
+    (e.g. ``movements``) are unlimited.
+    """
+    max_bucket = 1440 // bucket
+    starts = np.array([m for m, _ in modes])
+    active = np.searchsorted(starts, np.arange(max_bucket) * bucket, side="right") - 1
+    table = np.full((len(kinds), max_bucket), UNLIMITED, dtype=np.int64)
+    for k, kind in enumerate(kinds):
+        for j, (_, mode) in enumerate(modes):
+            per_hr = cfg["capacity_modes"][mode].get(kind)
+            if per_hr is not None:
+                table[k, active % len(modes) == j] = max(1, int(per_hr * bucket / 60))
+    return table
+
+def select_profiles(cfgs, airport_profile):
+    """Profile keys from 'JFK', 'JFK,LGA' or 'all'."""
+    profiles = list(cfgs) if airport_profile.lower() == "all" else \
+        [p.strip().upper() for p in airport_profile.split(",")]
+    for profile_key in profiles:
+        if profile_key not in cfgs:
+            raise KeyError(f"Airport profile '{profile_key}' not found in config. Available keys: {list(cfgs.keys())}")
+    return profiles
+
+def profile_tables(cfgs, profiles, kinds=KINDS, capacity_mode=None, schedule=None):
+    """Common bucket size, capacity tables and mode schedules of the selected profiles."""
+    buckets = {cfgs[p].get("bucket_minutes", 5) for p in profiles}
+    if len(buckets) > 1:
+        raise SystemExit(f"Airport profiles use different bucket_minutes {sorted(buckets)}; optimize them separately.")
+    bucket = buckets.pop()
+    modes = {p: mode_schedule(cfgs[p], capacity_mode, schedule) for p in profiles}
+    tables = {p: capacity_table(cfgs[p], modes[p], bucket, kinds) for p in profiles}
+    return bucket, tables, modes
+
+def add_windows(df, cfgs, profiles, bucket):
+    """Keep flights touching a profiled airport and add their minute and [lb, ub] bucket windows.
+
+    Windows come from the origin's profile, else the destination's.
+    """
+    origin = df["origin"].astype(str).str.upper()
+    dest = df["dest"].astype(str).str.upper()
+    keep = origin.isin(profiles) | dest.isin(profiles)
+    df = df[keep].copy()
+    home = origin[keep].where(origin[keep].isin(profiles), dest[keep])
+    window = home.map({p: cfgs[p].get("window_plus_minus_min", 15) for p in profiles}).to_numpy()
+
+    df["sched_dep"] = pd.to_datetime(df["sched_dep"])
+    df["minute"] = df["sched_dep"].dt.hour * 60 + df["sched_dep"].dt.minute
+    df["min_lb"] = (df["minute"] - window).clip(lower=0)
+    df["min_ub"] = (df["minute"] + window).clip(upper=1439)
+    df["bucket_lb"] = (df["min_lb"] // bucket).astype(int)
+    df["bucket_ub"] = (df["min_ub"] // bucket).astype(int)
+    return df
+
+def flight_usage(dfd, bucket_lb, bucket_ub, sched_bucket, bucket, tables, kinds=KINDS):
+    """Index which capacity slots every flight loads, per airport and kind.
+
+    ``tables`` maps airport code -> ``capacity_table``. Departures load ``origin`` at the departure
+    bucket; arrivals load ``dest`` at the scheduled arrival shifted by the same amount as the
+    departure; movements load both. Slots are numbered ``resource * T + absolute_bucket`` where
+    buckets are counted from midnight of the earliest date, so a flight's candidate slots for one
+    resource are contiguous. Returns ``({"flight", "start"}, capacity, resources)``: usage row ``u``
+    puts flight ``flight[u]`` in slot ``start[u] + (b - bucket_lb)`` when assigned bucket ``b``,
+    ``capacity`` is indexed by slot and ``resources`` lists the (airport, kind) of each resource.
+
+    Kinds without a limit in any mode get no resource, and usage rows whose candidate slots are all
+    ``UNLIMITED`` are dropped: they can never bind but would still link flights into one subproblem.
+    """
+    max_bucket = 1440 // bucket
+    lb = np.asarray(bucket_lb, dtype=np.int64)
+    width = np.asarray(bucket_ub, dtype=np.int64) - lb + 1
+    shift_lb = lb - np.asarray(sched_bucket, dtype=np.int64)
+    epoch = dfd["sched_dep"].min().normalize()
+    day = ((dfd["sched_dep"].dt.normalize() - epoch).dt.days).to_numpy(dtype=np.int64)
+    at_lb = {"departures": day * max_bucket + lb}
+    if "sched_arr" in dfd.columns:
+        arr = (pd.to_datetime(dfd["sched_arr"]) - epoch).dt.total_seconds() // (60 * bucket)
+        at_lb["arrivals"] = (arr.fillna(-1).to_numpy(dtype=np.int64) + shift_lb)
+        at_lb["arrivals"][arr.isna().to_numpy()] = -1
+    origin = dfd["origin"].astype(str).str.upper().to_numpy()
+    dest = dfd["dest"].astype(str).str.upper().to_numpy() if "dest" in dfd.columns else np.full(len(dfd), "")
+
+    flights, resource, start_abs, resources = [], [], [], []
+    for airport in tables:
+        for kind in kinds:
+            if (tables[airport][kinds.index(kind)] >= UNLIMITED).all():
+                continue
+            r = len(resources)
+            resources.append((airport, kind))
+            parts = []
+            if kind in ("departures", "movements"):
+                parts.append((origin == airport, at_lb["departures"]))
+            if kind in ("arrivals", "movements") and "arrivals" in at_lb:
+                parts.append((dest == airport, at_lb["arrivals"]))
+            for mask, base in parts:
+                idx = np.flatnonzero(mask & (base >= 0))
+                flights.append(idx)
+                resource.append(np.full(len(idx), r, dtype=np.int64))
+                start_abs.append(base[idx])
+
+    flight = np.concatenate(flights) if flights else np.zeros(0, dtype=np.int64)
+    resource = np.concatenate(resource) if resource else np.zeros(0, dtype=np.int64)
+    start_abs = np.concatenate(start_abs) if start_abs else np.zeros(0, dtype=np.int64)
+    num_abs = int((start_abs + width[flight]).max()) if len(flight) else 0
+
+    table = np.concatenate([tables[airport][[kinds.index(kind)]] for airport, kind in resources]) \
+        if resources else np.zeros((0, max_bucket), dtype=np.int64)
+    capacity = table[:, np.arange(num_abs) % max_bucket].ravel()
+    start = resource * num_abs + start_abs
+    limited = np.concatenate(([0], np.cumsum(capacity < UNLIMITED)))
+    keep = limited[start + width[flight]] > limited[start]
+    usage = {"flight": flight[keep], "start": start[keep]}
+    return usage, capacity, resources
+
+def usage_slots(usage, assigned, bucket_lb):
+    """Slot of every usage row when flights sit in ``assigned`` buckets."""
+    f = usage["flight"]
+    return usage["start"] + np.asarray(assigned, dtype=np.int64)[f] - np.asarray(bucket_lb, dtype=np.int64)[f]
+
+def slot_loads(usage, assigned, bucket_lb, size, flights=None):
+    """Flights per slot for an assignment (optionally only the usage rows of ``flights``)."""
+    slots = usage_slots(usage, assigned, bucket_lb)
+    if flights is not None:
+        slots = slots[np.isin(usage["flight"], flights)]
+    return np.bincount(slots, minlength=size)[:size]
+
+def usage_ranges(usage, bucket_lb, bucket_ub):
+    """Flattened (usage row, slot) pairs covering every candidate slot of every usage row."""
+    f = usage["flight"]
+    width = (np.asarray(bucket_ub, dtype=np.int64) - np.asarray(bucket_lb, dtype=np.int64) + 1)[f]
+    rows = np.repeat(np.arange(len(f)), width)
+    offsets = np.zeros(len(f) + 1, dtype=np.int64)
+    np.cumsum(width, out=offsets[1:])
+    slots = usage["start"][rows] + np.arange(offsets[-1]) - offsets[:-1][rows]
+    return rows, slots
+
+def localize(usage, bucket_lb, bucket_ub, capacity, flights):
+    """Restrict a problem to ``flights``: flight ids become positions in ``flights`` and slots are
+    renumbered compactly (keeping their order), so subproblems carry only the capacity they touch.
+
+    Returns (local usage, local capacity, global slot ids of the local slots).
+    """
+    flights = np.asarray(flights, dtype=np.int64)
+    pos = np.full(len(bucket_lb), -1, dtype=np.int64)
+    pos[flights] = np.arange(len(flights))
+    keep = pos[usage["flight"]] >= 0
+    sub = {"flight": usage["flight"][keep], "start": usage["start"][keep]}
+    _, slots = usage_ranges(sub, bucket_lb, bucket_ub)
+    touched = np.unique(slots)
+    local = {"flight": pos[sub["flight"]], "start": np.searchsorted(touched, sub["start"])}
+    return local, np.asarray(capacity)[touched], touched
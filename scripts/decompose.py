@@ -0,0 +1,180 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from scripts.capacity import localize, slot_loads, usage_ranges
+from scripts.greedy import greedy_assign
+from scripts.model_builder import optimize_buckets
+from scripts.rotations import localize_precedences
+from scripts.solution_cache import cache_get, cache_put, problem_key
+
+def split_subproblems(dfd, usage, bucket_lb, bucket_ub, by_origin=True, precedences=None):
+    """Return a list of row-index arrays, one per independent subproblem.
+
+    Flights start out grouped by date (and origin); groups whose flights can compete for the same
+    capacity slot (e.g. departures from two profiled airports arriving at a third) or are linked by
+    a rotation precedence are merged.
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    n = len(dfd)
+    keys = [dfd["sched_dep"].dt.date]
+    if by_origin and "origin" in dfd.columns:
+        keys.append(dfd["origin"])
+    group = dfd.groupby(keys, sort=True).ngroup().to_numpy()
+    rows, slots = usage_ranges(usage, bucket_lb, bucket_ub)
+    _, slot_node = np.unique(slots, return_inverse=True)
+    num_groups = int(group.max()) + 1 if n else 0
+    src = np.concatenate([np.arange(n), usage["flight"][rows]])
+    dst = np.concatenate([n + group, n + num_groups + slot_node.ravel()])
+    num_nodes = n + num_groups + (int(slot_node.max()) + 1 if len(slots) else 0)
+    if precedences is not None:
+        src = np.concatenate([src, precedences["prev"]])
+        dst = np.concatenate([dst, precedences["next"]])
+    graph = coo_matrix((np.ones(len(src), dtype=np.int8), (src, dst)), shape=(num_nodes, num_nodes))
+    _, label = connected_components(graph, directed=False)
+    _, part = np.unique(label[:n], return_inverse=True)
+    order = np.argsort(part, kind="stable")
+    return np.split(order, np.flatnonzero(np.diff(part[order])) + 1) if n else []
+
+def solve_subproblem(task):
+    """Solve one subproblem, splitting it into overlapping time windows when too large.
+
+    Windows are solved in time order. Flights scheduled in a window's core are committed; flights
+    in the trailing overlap only compete for capacity and are re-decided by the next window.
+    Capacity consumed by committed flights is removed before solving later windows. A window
+    without a solution is placed by the greedy scheduler against its remaining capacity.
+    """
+    lb, ub, sched = task["bucket_lb"], task["bucket_ub"], task["sched_bucket"]
+    usage, capacity = task["usage"], task["capacity"]
+    when = task["sched_time"]
+    max_flights = task.get("max_flights", 0)
+    chosen = sched.copy()
+    stats = {"models": 0, "build_time": 0.0, "solve_time": 0.0, "status": [], "num_vars": 0,
+             "num_constraints": 0, "objective": 0.0, "bound": 0.0, "gap": 0.0, "greedy_windows": 0}
+
+    first, last = int(when.min()), int(when.max()) + 1
+    if not max_flights or len(sched) <= max_flights:
+        windows = [(first, last, last)]
+    else:
+        core, overlap = task["window_buckets"], task["overlap_buckets"]
+        windows = [(s, s + core, s + core + overlap) for s in range(first, last, core)]
+
+    time_limit = task["time_limit"] / len(windows)
+    residual = np.asarray(capacity, dtype=np.int64).copy()
+    committed = np.zeros(len(sched), dtype=bool)
+    for start, core_end, end in windows:
+        free = np.flatnonzero(~committed & (when >= start) & (when < end))
+        if len(free) == 0:
+            continue
+        local, cap_left, touched = localize(usage, lb, ub, np.maximum(residual, 0), free)
+        prec = task.get("precedences")
+        if prec is not None:
+            prec = localize_precedences(prec, free, chosen, fixed=committed)
+        hint = None
+        if task.get("warm_start"):
+            hint = greedy_assign(lb[free], ub[free], sched[free], local, cap_left, prec)
+        extra = task.get("extra_costs")
+        picked, s = optimize_buckets(lb[free], ub[free], sched[free], local, cap_left,
+                                     time_limit, task["workers"], hint=hint,
+                                     extra_costs=None if extra is None else extra[free],
+                                     deviation_weight=task.get("deviation_weight", 1),
+                                     precedences=prec, precedence_penalty=task.get("precedence_penalty", 0))
+        stats["models"] += 1
+        stats["build_time"] += s["build_time"]
+        stats["solve_time"] += s["solve_time"]
+        stats["status"].append(s["status"])
+        stats["num_vars"] += s["num_vars"]
+        stats["num_constraints"] += s["num_capacity_constraints"] + s["num_precedence_constraints"]
+        if s["objective"] is not None:
+            stats["objective"] += s["objective"]
+            stats["bound"] += s["bound"]
+            stats["gap"] = max(stats["gap"], s["gap"])
+        else:
+            picked = hint if hint is not None else greedy_assign(lb[free], ub[free], sched[free], local, cap_left, prec)
+            stats["greedy_windows"] += 1
+        keep = when[free] < core_end
+        chosen[free[keep]] = picked[keep]
+        committed[free[keep]] = True
+        residual[touched] -= slot_loads(local, picked, lb[free], len(touched), flights=np.flatnonzero(keep))
+    return chosen, stats
+
+def solve_decomposed(dfd, bucket, usage, capacity, time_limit=30.0, processes=None, by_origin=True,
+                     max_flights=0, window_hours=4, overlap_hours=1, warm_start=False,
+                     extra_costs=None, deviation_weight=1, precedences=None, precedence_penalty=0,
+                     cache_dir=None, cache_max_mb=512):
+    """Solve every independent subproblem in a process pool and merge the ``bucket_opt`` values.
+
+    Each task only carries its own flights' usage rows, rotation precedences and the capacity
+    slots they can touch. With ``cache_dir`` solved subproblems are stored by fingerprint (see
+    solution_cache.py) and unchanged ones, e.g. the untouched days of a rerun, skip model building.
+    """
+    max_bucket = 1440 // bucket
+    processes = processes or os.cpu_count() or 1
+    workers = max(1, (os.cpu_count() or 1) // processes)
+    sched_all = (dfd["minute"] // bucket).to_numpy(dtype=np.int64)
+    lb_all = dfd["bucket_lb"].to_numpy(dtype=np.int64)
+    ub_all = dfd["bucket_ub"].to_numpy(dtype=np.int64)
+    day = (dfd["sched_dep"].dt.normalize() - dfd["sched_dep"].min().normalize()).dt.days.to_numpy(dtype=np.int64)
+    when_all = day * max_bucket + sched_all
+
+    parts = split_subproblems(dfd, usage, lb_all, ub_all, by_origin=by_origin, precedences=precedences)
+    tasks = []
+    for idx in parts:
+        local, local_capacity, _ = localize(usage, lb_all, ub_all, capacity, idx)
+        tasks.append({
+            "bucket_lb": lb_all[idx], "bucket_ub": ub_all[idx], "sched_bucket": sched_all[idx],
+            "sched_time": when_all[idx], "usage": local, "capacity": local_capacity,
+            "time_limit": time_limit, "workers": workers, "max_flights": max_flights, "warm_start": warm_start,
+            "window_buckets": max(1, int(window_hours * 60 // bucket)),
+            "overlap_buckets": int(overlap_hours * 60 // bucket),
+            "extra_costs": None if extra_costs is None else extra_costs[idx],
+            "deviation_weight": deviation_weight,
+            "precedences": None if precedences is None else localize_precedences(precedences, idx, sched_all),
+            "precedence_penalty": precedence_penalty,
+        })
+
+    t0 = time.perf_counter()
+    chosen = sched_all.copy()
+    summary = {"subproblems": len(tasks), "models": 0, "build_time": 0.0, "solve_time": 0.0, "status": {},
+               "num_vars": 0, "num_constraints": 0, "objective": 0.0, "bound": 0.0, "gap": 0.0, "cache_hits": 0,
+               "greedy_windows": 0}
+
+    def merge(idx, picked, s):
+        chosen[idx] = picked
+        for key in ("num_vars", "num_constraints", "objective", "bound", "greedy_windows"):
+            summary[key] += s.get(key, 0)
+        summary["gap"] = max(summary["gap"], s["gap"])
+        for status in s["status"]:
+            summary["status"][status] = summary["status"].get(status, 0) + 1
+
+    keys = [_task_key(task) for task in tasks] if cache_dir else [None] * len(tasks)
+    pending = []
+    for k, key in enumerate(keys):
+        hit = cache_get(cache_dir, key)
+        if hit is None:
+            pending.append(k)
+        else:
+            merge(parts[k], *hit)
+            summary["cache_hits"] += 1
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            for k, (picked, s) in zip(pending, pool.map(solve_subproblem, [tasks[k] for k in pending])):
+                merge(parts[k], picked, s)
+                summary["models"] += s["models"]
+                summary["build_time"] += s["build_time"]
+                summary["solve_time"] += s["solve_time"]
+                if all(status in ("OPTIMAL", "FEASIBLE") for status in s["status"]):
+                    cache_put(cache_dir, keys[k], picked, s, cache_max_mb)
+    summary["wall_time"] = time.perf_counter() - t0
+    return pd.Series(chosen, index=dfd.index), summary
+
+def _task_key(task):
+    """Cache fingerprint of a subproblem task; the worker count is left out as it only affects speed."""
+    settings = {k: task[k] for k in ("time_limit", "max_flights", "warm_start", "window_buckets",
+                                     "overlap_buckets", "deviation_weight", "precedence_penalty")}
+    return problem_key(task["bucket_lb"], task["bucket_ub"], task["sched_bucket"], task["usage"], task["capacity"],
+                       task["extra_costs"], task["precedences"], task["sched_time"], solver="decompose", **settings)
@@ -0,0 +1,72 @@
+import time
+import numpy as np
+import pandas as pd
+from scripts.model_builder import candidate_pairs
+from scripts.utils import DEMAND_WINDOWS, demand_keys, demand_tensor, rolling_sums
+
+# Features recomputed for each candidate bucket; any other model feature is taken from the flight row
+SLOT_FEATURES = ["minute", "dow", "count"] + list(DEMAND_WINDOWS)
+DEFAULT_FEATURES = ["minute", "dow", "count", "roll_15", "roll_60"]
+
+_MODELS = {}
+
+def load_delay_model(path):
+    """Load a model saved by 1_train_model.py once per process."""
+    if path not in _MODELS:
+        import joblib
+        _MODELS[path] = joblib.load(path)
+    return _MODELS[path]
+
+def model_features(model):
+    names = getattr(model, "feature_names_in_", None)
+    return list(names) if names is not None else DEFAULT_FEATURES
+
+def candidate_features(dfd, flight, cand_bucket, bucket, features):
+    """Feature matrix (float32) with one row per (flight, candidate bucket) pair.
+
+    ``minute`` is the middle of the candidate bucket and ``count``/``roll_*`` are the scheduled
+    demand of the flight's date and origin at that bucket, so each row describes departing in
+    the candidate slot instead of the scheduled one.
+    """
+    date, airport, sched_bucket = demand_keys(dfd, bucket)
+    tensor, date_code, airport_code, _, _ = demand_tensor(date, airport, sched_bucket, bucket)
+    demand = {"count": tensor}
+    for name, minutes in DEMAND_WINDOWS.items():
+        demand[name] = rolling_sums(tensor, max(1, round(minutes / bucket)))
+
+    X = np.zeros((len(flight), len(features)), dtype=np.float32)
+    for k, name in enumerate(features):
+        if name == "minute":
+            X[:, k] = cand_bucket * bucket + bucket // 2
+        elif name == "dow":
+            X[:, k] = dfd["sched_dep"].dt.dayofweek.to_numpy()[flight]
+        elif name in demand:
+            X[:, k] = demand[name][date_code[flight], airport_code[flight], cand_bucket]
+        elif name in dfd.columns:
+            X[:, k] = pd.to_numeric(dfd[name], errors="coerce").fillna(0).to_numpy()[flight]
+    return X
+
+def predict_unique(model, X, features):
+    """Predict each distinct feature row once and broadcast the result back to all rows."""
+    uniq, inverse = np.unique(X, axis=0, return_inverse=True)
+    pred = model.predict(pd.DataFrame(uniq, columns=features))
+    return np.asarray(pred, dtype=np.float64)[inverse.ravel()], len(uniq)
+
+def delay_cost_matrix(dfd, model, bucket, weight=1.0):
+    """Predicted-delay objective term as an (n_flights, max_window) int matrix.
+
+    Entry [i, k] is ``weight`` x the predicted departure delay (minutes, clipped at 0) of flight
+    ``i`` departing in bucket ``bucket_lb[i] + k``. All pairs are scored in one ``predict`` call.
+    """
+    t0 = time.perf_counter()
+    lb = dfd["bucket_lb"].to_numpy(dtype=np.int64)
+    ub = dfd["bucket_ub"].to_numpy(dtype=np.int64)
+    flight, cand_bucket, _ = candidate_pairs(lb, ub)
+    features = model_features(model)
+    X = candidate_features(dfd, flight, cand_bucket, bucket, features)
+    pred, num_unique = predict_unique(model, X, features)
+
+    costs = np.zeros((len(lb), int((ub - lb).max()) + 1 if len(lb) else 0), dtype=np.int64)
+    costs[flight, cand_bucket - lb[flight]] = np.rint(weight * np.clip(pred, 0, None))
+    stats = {"pairs": len(flight), "unique_rows": num_unique, "score_time": time.perf_counter() - t0}
+    return costs, stats
@@ -0,0 +1,131 @@
+import numpy as np
+
+def _find(parent, i):
+    """Union-find root lookup with path halving."""
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+def _rotation_bounds(n, precedences):
+    """Per-flight predecessor/successor links and fixed bounds from rotation precedences."""
+    pred, succ = [-1] * n, [-1] * n
+    pred_limit, succ_limit = [0] * n, [0] * n
+    lo, hi = [-(1 << 30)] * n, [1 << 30] * n
+    if precedences is not None:
+        for p, q, limit in zip(precedences["prev"].tolist(), precedences["next"].tolist(),
+                               precedences["limit"].tolist()):
+            if p < 0:
+                lo[q] = max(lo[q], -limit)
+            elif q < 0:
+                hi[p] = min(hi[p], limit)
+            else:
+                pred[q], pred_limit[q] = p, limit
+                succ[p], succ_limit[p] = q, limit
+    return pred, pred_limit, succ, succ_limit, lo, hi
+
+def _bounds(i, lb, ub, chosen, done, links):
+    """Window of flight ``i`` narrowed by rotation links to already assigned legs (if satisfiable)."""
+    pred, pred_limit, succ, succ_limit, lo, hi = links
+    low, high = max(lb, lo[i]), min(ub, hi[i])
+    p, q = pred[i], succ[i]
+    if p >= 0 and done[p]:
+        low = max(low, chosen[p] - pred_limit[i])
+    if q >= 0 and done[q]:
+        high = min(high, chosen[q] + succ_limit[i])
+    return (low, high) if low <= high else (lb, ub)
+
+def greedy_assign(bucket_lb, bucket_ub, sched_bucket, usage, capacity, precedences=None):
+    """Assign each flight to the nearest bucket in its window whose capacity slots all have room.
+
+    ``usage`` and ``capacity`` describe which slots each flight loads (see capacity.py); remaining
+    capacity is tracked per slot. Flights are processed in scheduled order; ties prefer the earlier
+    bucket and flights with no free bucket in their window stay at their scheduled bucket.
+
+    When every flight loads at most one slot (e.g. departures per (day, bucket)), two union-find
+    structures over the slots point every full slot at the next free slot to the right and to the
+    left, so each lookup is near O(1) and the whole pass is O(n log n) for the initial sort.
+    Flights loading several slots (departure and arrival) check their window bucket by bucket.
+    Rotation ``precedences`` (see rotations.py) narrow a flight's window once the other leg of
+    the pair has been placed.
+    """
+    lb = np.asarray(bucket_lb, dtype=np.int64)
+    ub = np.asarray(bucket_ub, dtype=np.int64)
+    sched = np.asarray(sched_bucket, dtype=np.int64)
+    order = np.lexsort((ub - lb, sched)).tolist()
+    per_flight = np.bincount(usage["flight"], minlength=len(sched))
+    links = _rotation_bounds(len(sched), precedences)
+    if len(per_flight) and per_flight.max() > 1:
+        return _greedy_multi(lb, ub, sched, usage, capacity, order, links)
+
+    num_slots = len(capacity)
+    remaining = np.asarray(capacity, dtype=np.int64).copy()
+    full = remaining <= 0
+    slots = np.arange(num_slots + 1)
+    # right[s]: next free slot >= s (num_slots is a sentinel); left[s + 1]: next free slot <= s (0 is a sentinel)
+    right = np.where(np.append(full, False), slots + 1, slots).tolist()
+    left = np.where(np.insert(full, 0, False), slots - 1, slots).tolist()
+    remaining = remaining.tolist()
+
+    start = np.full(len(sched), -1, dtype=np.int64)
+    start[usage["flight"]] = usage["start"]
+    g_lb = start.tolist()
+    g_sched = (start + sched - lb).tolist()
+    g_ub = (start + ub - lb).tolist()
+    chosen = sched.tolist()
+    done = [False] * len(chosen)
+    lb_list, ub_list = lb.tolist(), ub.tolist()
+    for i in order:
+        done[i] = True
+        if g_lb[i] < 0:
+            continue
+        low, high = _bounds(i, lb_list[i], ub_list[i], chosen, done, links)
+        g = g_sched[i]
+        g_low, g_high = g_lb[i] + low - lb_list[i], g_ub[i] - (ub_list[i] - high)
+        target = min(max(g, g_low), g_high)
+        r = _find(right, target)
+        l = _find(left, target + 1) - 1
+        r_ok, l_ok = r <= g_high, l >= g_low
+        if l_ok and (not r_ok or abs(g - l) <= abs(r - g)):
+            pick = l
+        elif r_ok:
+            pick = r
+        else:
+            pick = target
+        remaining[pick] -= 1
+        if remaining[pick] == 0:
+            right[pick] = pick + 1
+            left[pick + 1] = pick
+        chosen[i] = lb_list[i] + pick - g_lb[i]
+    return np.asarray(chosen, dtype=np.int64)
+
+def _greedy_multi(lb, ub, sched, usage, capacity, order, links):
+    """Greedy pass for flights that load several slots: scan candidates nearest-first."""
+    remaining = np.asarray(capacity, dtype=np.int64).tolist()
+    by_flight = np.argsort(usage["flight"], kind="stable")
+    bounds = np.zeros(len(sched) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(usage["flight"], minlength=len(sched)), out=bounds[1:])
+    starts = usage["start"][by_flight].tolist()
+    bounds = bounds.tolist()
+    lb, ub, chosen = lb.tolist(), ub.tolist(), sched.tolist()
+    done = [False] * len(chosen)
+    for i in order:
+        done[i] = True
+        rows = [start - lb[i] for start in starts[bounds[i]:bounds[i + 1]]]
+        if not rows:
+            continue
+        s = chosen[i]
+        lo, hi = _bounds(i, lb[i], ub[i], chosen, done, links)
+        pick = min(max(s, lo), hi)
+        for d in range(max(s - lo, hi - s) + 1):
+            found = False
+            for b in (s - d, s + d) if d else (s,):
+                if lo <= b <= hi and all(remaining[r + b] > 0 for r in rows):
+                    pick, found = b, True
+                    break
+            if found:
+                break
+        for r in rows:
+            remaining[r + pick] -= 1
+        chosen[i] = pick
+    return np.asarray(chosen, dtype=np.int64)
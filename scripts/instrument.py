@@ -0,0 +1,93 @@
+import cProfile
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+def rss_bytes():
+    """Current resident set size (Linux /proc; elsewhere the process peak from getrusage)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+def add_arguments(parser):
+    """Instrumentation flags shared by the pipeline scripts."""
+    parser.add_argument("--metrics_path", default=None,
+                        help="Append per-stage timings, peak memory, counters and solver stats as JSON lines")
+    parser.add_argument("--profile_dir", default=None, help="Write a cProfile dump per stage into this directory")
+
+def start_run(script, args=None):
+    """Run context for one script invocation; ``args`` may carry --metrics_path / --profile_dir."""
+    run = {"script": script, "run_id": uuid.uuid4().hex[:12], "started": time.time(), "records": [],
+           "metrics_path": getattr(args, "metrics_path", None), "profile_dir": getattr(args, "profile_dir", None)}
+    if run["profile_dir"]:
+        os.makedirs(run["profile_dir"], exist_ok=True)
+    return run
+
+def log(run, stage, **fields):
+    """Record one JSON line for ``stage`` (also used for stages timed elsewhere, e.g. the CP-SAT solve)."""
+    if run is None:
+        return None
+    record = {"script": run["script"], "run_id": run["run_id"], "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "stage": stage, **fields}
+    run["records"].append(record)
+    if run["metrics_path"]:
+        with open(run["metrics_path"], "a") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+    return record
+
+@contextmanager
+def stage(run, name, interval=0.01, **counters):
+    """Time a block, sample its peak RSS and log it with any counters set on the yielded dict.
+
+    Usage: ``with stage(run, "parse") as s: ...; s["rows_out"] = len(df)``. With ``run`` None the
+    block runs unmeasured, so library functions can take an optional run. Nested stages are timed
+    but only the outermost one is profiled.
+    """
+    if run is None:
+        yield dict(counters)
+        return
+    peak = [rss_bytes()]
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(interval):
+            peak[0] = max(peak[0], rss_bytes())
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    profiler = cProfile.Profile() if run["profile_dir"] and not run.get("profiling") else None
+    fields = dict(counters)
+    t0, c0 = time.perf_counter(), time.process_time()
+    if profiler:
+        run["profiling"] = True
+        profiler.enable()
+    try:
+        yield fields
+    finally:
+        if profiler:
+            profiler.disable()
+            run["profiling"] = False
+            path = os.path.join(run["profile_dir"], f"{run['script']}-{run['run_id']}-{name}.prof")
+            profiler.dump_stats(path)
+            fields["profile"] = path
+        wall, cpu = time.perf_counter() - t0, time.process_time() - c0
+        done.set()
+        sampler.join()
+        peak[0] = max(peak[0], rss_bytes())
+        log(run, name, wall_s=round(wall, 4), cpu_s=round(cpu, 4), peak_rss_mb=round(peak[0] / 2**20, 1), **fields)
+
+def finish_run(run, **fields):
+    """Log the run summary: total wall time, the largest stage peak RSS and any final counters."""
+    if run is None:
+        return None
+    peaks = [r["peak_rss_mb"] for r in run["records"] if "peak_rss_mb" in r]
+    return log(run, "run", wall_s=round(time.time() - run["started"], 4),
+               peak_rss_mb=max(peaks) if peaks else round(rss_bytes() / 2**20, 1), **fields)
@@ -0,0 +1,183 @@
+import importlib.util
+import time
+import numpy as np
+from scripts.capacity import usage_ranges
+
+_ORTOOLS = None
+
+def ortools_available():
+    """Whether OR-Tools is installed, checked without importing it (CP-SAT is imported on first use)."""
+    global _ORTOOLS
+    if _ORTOOLS is None:
+        _ORTOOLS = importlib.util.find_spec("ortools") is not None
+    return _ORTOOLS
+
+def candidate_pairs(bucket_lb, bucket_ub):
+    """Expand per-flight [lb, ub] windows into flat (flight, bucket) arrays, grouped by flight."""
+    lb = np.asarray(bucket_lb, dtype=np.int64)
+    ub = np.asarray(bucket_ub, dtype=np.int64)
+    width = np.maximum(ub - lb + 1, 0)
+    offsets = np.zeros(len(lb) + 1, dtype=np.int64)
+    np.cumsum(width, out=offsets[1:])
+    flight = np.repeat(np.arange(len(lb), dtype=np.int64), width)
+    bucket = np.arange(offsets[-1], dtype=np.int64) - np.repeat(offsets[:-1], width) + np.repeat(lb, width)
+    return flight, bucket, offsets
+
+def make_pairs(bucket_lb, bucket_ub):
+    """Candidate pairs as a dict with ``flight``, ``bucket`` and per-flight ``offsets`` arrays."""
+    flight, bucket, offsets = candidate_pairs(bucket_lb, bucket_ub)
+    return {"flight": flight, "bucket": bucket, "offsets": offsets}
+
+def inverted_index(keys):
+    """Group positions by key; return (order, starts, unique_keys) so group k is order[starts[k]:starts[k+1]]."""
+    keys = np.asarray(keys)
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    if len(sorted_keys) == 0:
+        return order, np.zeros(1, dtype=np.int64), sorted_keys
+    boundaries = np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1]) + 1
+    starts = np.concatenate(([0], boundaries, [len(sorted_keys)]))
+    return order, starts, sorted_keys[starts[:-1]]
+
+def build_assignment_model(pairs, costs, resources, precedences=None, penalty=0):
+    """Build a CP-SAT model assigning each flight to exactly one bucket in its window.
+
+    ``pairs`` comes from ``make_pairs`` and ``costs`` holds one integer objective coefficient per pair.
+    ``resources`` is a list of ``(members, slot_keys, capacity)`` tuples: candidate pair
+    ``members[k]`` loads capacity slot ``slot_keys[k]`` (a pair may load several slots) and
+    ``capacity`` is an array indexed by slot. Constraints are only emitted for slots whose demand
+    can exceed capacity.
+
+    ``precedences`` (see rotations.py) adds ``bucket[prev] - bucket[next] <= limit`` for every
+    entry, where an index of -1 drops that side. With ``penalty`` > 0 the constraints are soft and
+    every bucket of violation costs ``penalty``.
+    """
+    from ortools.sat.python import cp_model
+
+    flight, bucket, offsets = pairs["flight"], pairs["bucket"], pairs["offsets"]
+    model = cp_model.CpModel()
+    x = [model.NewBoolVar(f"x_{i}_{b}") for i, b in zip(flight.tolist(), bucket.tolist())]
+
+    for i in range(len(offsets) - 1):
+        model.AddExactlyOne(x[offsets[i]:offsets[i + 1]])
+
+    num_capacity = 0
+    for pair_index, slot_keys, capacity in resources:
+        order, starts, slots = inverted_index(slot_keys)
+        sizes = np.diff(starts)
+        caps = np.asarray(capacity)[slots]
+        for k in np.flatnonzero(sizes > caps).tolist():
+            members = pair_index[order[starts[k]:starts[k + 1]]]
+            model.Add(cp_model.LinearExpr.Sum([x[p] for p in members.tolist()]) <= int(caps[k]))
+            num_capacity += 1
+
+    costs = np.asarray(costs, dtype=np.int64)
+    nonzero = np.flatnonzero(costs)
+    terms, coefs = [x[p] for p in nonzero.tolist()], costs[nonzero].tolist()
+
+    num_precedence = 0
+    if precedences is not None:
+        for prev, nxt, limit in zip(precedences["prev"].tolist(), precedences["next"].tolist(),
+                                    precedences["limit"].tolist()):
+            expr = _bucket_expr(x, pairs, prev, 1) + _bucket_expr(x, pairs, nxt, -1)
+            if penalty > 0:
+                slack = model.NewIntVar(0, _max_violation(pairs, prev, nxt, limit), f"late_{num_precedence}")
+                model.Add(expr - slack <= limit)
+                terms.append(slack)
+                coefs.append(int(penalty))
+            else:
+                model.Add(expr <= limit)
+            num_precedence += 1
+    model.Minimize(cp_model.LinearExpr.WeightedSum(terms, coefs))
+
+    stats = {"num_vars": len(x), "num_capacity_constraints": num_capacity,
+             "num_precedence_constraints": num_precedence}
+    return model, x, stats
+
+def _bucket_expr(x, pairs, flight, sign):
+    """Linear expression ``sign`` x (bucket of ``flight``); empty for flight -1."""
+    from ortools.sat.python import cp_model
+
+    if flight < 0:
+        return cp_model.LinearExpr.Sum([])
+    lo, hi = pairs["offsets"][flight], pairs["offsets"][flight + 1]
+    return cp_model.LinearExpr.WeightedSum(x[lo:hi], (sign * pairs["bucket"][lo:hi]).tolist())
+
+def _max_violation(pairs, prev, nxt, limit):
+    """Upper bound of ``bucket[prev] - bucket[next] - limit`` over both windows."""
+    offsets, bucket = pairs["offsets"], pairs["bucket"]
+    hi = bucket[offsets[prev + 1] - 1] if prev >= 0 else 0
+    lo = bucket[offsets[nxt]] if nxt >= 0 else 0
+    return max(0, int(hi - lo - limit))
+
+def add_hints(model, x, pairs, hint):
+    """Hint every flight's candidate variables from a previous (or greedy) bucket assignment."""
+    values = (pairs["bucket"] == np.asarray(hint, dtype=np.int64)[pairs["flight"]]).tolist()
+    for var, value in zip(x, values):
+        model.AddHint(var, value)
+
+def solve_assignment(model, x, pairs, fallback, time_limit=30.0, workers=8):
+    """Solve a model from ``build_assignment_model``; flights without a solution keep ``fallback``.
+
+    The stats carry the CP-SAT status, objective, best bound, relative gap and solver wall time;
+    objective, bound and gap are None when no solution was found.
+    """
+    from ortools.sat.python import cp_model
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = float(time_limit)
+    solver.parameters.num_search_workers = workers
+    t0 = time.perf_counter()
+    status = solver.Solve(model)
+    solve_time = time.perf_counter() - t0
+
+    chosen = np.asarray(fallback, dtype=np.int64).copy()
+    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        picked = np.fromiter((solver.BooleanValue(v) for v in x), dtype=bool, count=len(x))
+        chosen[pairs["flight"][picked]] = pairs["bucket"][picked]
+    stats = {"status": solver.StatusName(status), "solve_time": solve_time, "wall_time": solver.WallTime(),
+             "objective": None, "bound": None, "gap": None}
+    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        objective, bound = solver.ObjectiveValue(), solver.BestObjectiveBound()
+        stats.update(objective=objective, bound=bound, gap=abs(objective - bound) / max(1.0, abs(objective)))
+    return chosen, stats
+
+def deviation_costs(pairs, sched_bucket):
+    """Objective coefficient |bucket - scheduled bucket| for every candidate pair."""
+    return np.abs(pairs["bucket"] - np.asarray(sched_bucket, dtype=np.int64)[pairs["flight"]])
+
+def usage_pairs(pairs, bucket_lb, bucket_ub, usage):
+    """Expand capacity usage rows (see capacity.py) to (candidate pair, slot) arrays."""
+    rows, slots = usage_ranges(usage, bucket_lb, bucket_ub)
+    flight = usage["flight"][rows]
+    members = pairs["offsets"][flight] + slots - usage["start"][rows]
+    return members, slots
+
+def optimize_buckets(bucket_lb, bucket_ub, sched_bucket, usage, capacity,
+                     time_limit=30.0, workers=8, hint=None, extra_costs=None, deviation_weight=1,
+                     precedences=None, precedence_penalty=0):
+    """Assign flights to buckets under slot capacities; return (buckets, stats).
+
+    ``usage`` and ``capacity`` describe which capacity slots each flight loads (see capacity.py).
+    ``hint`` is an optional starting assignment (one bucket per flight) passed to CP-SAT.
+    The objective is ``deviation_weight`` x |bucket - scheduled| plus, when given,
+    ``extra_costs[i, bucket - bucket_lb[i]]`` (e.g. predicted delay, see delay_scoring.py).
+    ``precedences`` and ``precedence_penalty`` add aircraft rotation constraints (see rotations.py).
+    """
+    t0 = time.perf_counter()
+    pairs = make_pairs(bucket_lb, bucket_ub)
+    members, slot_keys = usage_pairs(pairs, bucket_lb, bucket_ub, usage)
+
+    costs = deviation_weight * deviation_costs(pairs, sched_bucket)
+    if extra_costs is not None:
+        flight = pairs["flight"]
+        costs = costs + np.asarray(extra_costs)[flight, pairs["bucket"] - np.asarray(bucket_lb)[flight]]
+    model, x, stats = build_assignment_model(pairs, costs, [(members, slot_keys, capacity)],
+                                             precedences, precedence_penalty)
+    if hint is not None:
+        add_hints(model, x, pairs, hint)
+    stats["build_time"] = time.perf_counter() - t0
+
+    chosen, solve_stats = solve_assignment(model, x, pairs, sched_bucket, time_limit, workers)
+    stats.update(solve_stats)
+    return chosen, stats
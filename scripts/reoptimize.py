@@ -0,0 +1,124 @@
+import time
+import numpy as np
+import pandas as pd
+from scripts.capacity import localize, slot_loads, usage_ranges, usage_slots
+from scripts.greedy import greedy_assign
+from scripts.model_builder import optimize_buckets, ortools_available
+from scripts.rotations import localize_precedences
+
+FLIGHT_KEY = ["carrier", "tailnum", "origin", "dest", "sched_dep"]
+
+def match_previous(dfd, previous, bucket):
+    """Previous bucket for every row of ``dfd`` (-1 for flights not found in ``previous``)."""
+    keys = [k for k in FLIGHT_KEY if k in dfd.columns and k in previous.columns]
+    prev = previous[keys].copy()
+    prev["sched_dep"] = pd.to_datetime(prev["sched_dep"])
+    opt_dep = pd.to_datetime(previous["opt_dep"])
+    prev["prev_bucket"] = ((opt_dep.dt.hour * 60 + opt_dep.dt.minute) // bucket).to_numpy()
+    # Duplicate keys are matched in order of appearance
+    prev["_occ"] = prev.groupby(keys).cumcount()
+    cur = dfd[keys].copy()
+    cur["_occ"] = cur.groupby(keys).cumcount()
+    merged = cur.merge(prev, on=keys + ["_occ"], how="left")
+    return merged["prev_bucket"].fillna(-1).to_numpy(dtype=np.int64)
+
+def reoptimize(dfd, previous, bucket, usage, capacity, time_limit=30.0, workers=8, radius=None,
+               extra_costs=None, deviation_weight=1, precedences=None, precedence_penalty=0):
+    """Re-plan only the parts of a previous schedule invalidated by a capacity or demand change.
+
+    A capacity slot (see capacity.py) is dirty when the previous assignment now exceeds its
+    capacity, when it lies in the window of a new/changed flight, or when a flight moved off its
+    scheduled bucket could now go back there (capacity was raised or flights were removed) - then
+    both its scheduled and its previous slots are dirty. Dirty slots are widened by
+    ``radius`` buckets (default: two window widths) and only flights previously using them, plus
+    the changed flights, are re-solved against the capacity left by the frozen flights, with their
+    previous buckets as solution hints. Dates with no dirty slot are not solved at all. When the
+    restricted problem has no solution, the affected dates are re-solved in full, and if that fails
+    too they are placed by the greedy scheduler against the remaining capacity. ``extra_costs``,
+    ``deviation_weight`` and the rotation ``precedences`` are passed through to ``optimize_buckets``;
+    legs outside the re-solved set stay fixed.
+    """
+    lb = dfd["bucket_lb"].to_numpy(dtype=np.int64)
+    ub = dfd["bucket_ub"].to_numpy(dtype=np.int64)
+    sched = (dfd["minute"] // bucket).to_numpy(dtype=np.int64)
+    day, _ = pd.factorize(dfd["sched_dep"].dt.date)
+    if radius is None:
+        radius = 2 * int(np.max(ub - lb)) if len(lb) else 0
+
+    prev = match_previous(dfd, previous, bucket)
+    changed = (prev < lb) | (prev > ub)
+    current = np.where(changed, sched, prev)
+    num_slots = len(capacity)
+
+    load = slot_loads(usage, current, lb, num_slots, flights=np.flatnonzero(~changed))
+    dirty = load > capacity
+    rows, slots = usage_ranges(usage, lb, ub)
+    dirty[slots[changed[usage["flight"][rows]]]] = True
+    # Moved flights whose scheduled slots all have room again
+    used = usage_slots(usage, current, lb)
+    at_sched = usage_slots(usage, sched, lb)
+    full = np.bincount(usage["flight"], weights=load[at_sched] >= capacity[at_sched], minlength=len(sched))
+    relaxed = (current != sched) & ~changed & (full == 0)
+    on_relaxed = relaxed[usage["flight"]]
+    dirty[at_sched[on_relaxed]] = True
+    dirty[used[on_relaxed]] = True
+    if radius:
+        # Widen dirty slots by ``radius`` buckets on each side with a cumulative-sum box filter
+        csum = np.concatenate(([0], np.cumsum(dirty)))
+        hi = np.minimum(np.arange(num_slots) + radius + 1, num_slots)
+        lo = np.maximum(np.arange(num_slots) - radius, 0)
+        dirty = (csum[hi] - csum[lo]) > 0
+
+    free = changed.copy()
+    free[usage["flight"][dirty[used]]] = True
+    summary = {"flights": len(sched), "changed": int(changed.sum()), "relaxed": int(relaxed.sum()),
+               "retried": False, "fallback": None}
+
+    chosen = current.copy()
+    t0 = time.perf_counter()
+    if free.any():
+        picked, status = solve_free(free, lb, ub, sched, chosen, usage, capacity,
+                                    time_limit, workers, extra_costs, deviation_weight,
+                                    precedences, precedence_penalty)
+        if status not in ("OPTIMAL", "FEASIBLE", "GREEDY"):
+            free = np.isin(day, np.unique(day[free]))
+            picked, status = solve_free(free, lb, ub, sched, chosen, usage, capacity,
+                                        time_limit, workers, extra_costs, deviation_weight,
+                                        precedences, precedence_penalty)
+            summary["retried"] = True
+        if status not in ("OPTIMAL", "FEASIBLE", "GREEDY"):
+            # Never fall back to the unconstrained scheduled buckets
+            picked = greedy_free(free, lb, ub, sched, chosen, usage, capacity, precedences)
+            summary["fallback"] = "greedy"
+        chosen[free] = picked
+        summary["status"] = status
+    summary.update(free=int(free.sum()), dirty_days=int(np.unique(day[free]).size),
+                   solve_time=time.perf_counter() - t0)
+    return pd.Series(chosen, index=dfd.index), summary
+
+def _restrict(free, lb, ub, current, usage, capacity, precedences):
+    """The ``free`` flights' problem against the capacity left by all other flights in ``current``."""
+    residual = capacity - slot_loads(usage, current, lb, len(capacity), flights=np.flatnonzero(~free))
+    idx = np.flatnonzero(free)
+    local, local_capacity, _ = localize(usage, lb, ub, np.maximum(residual, 0), idx)
+    if precedences is not None:
+        precedences = localize_precedences(precedences, idx, current)
+    return idx, local, local_capacity, precedences
+
+def greedy_free(free, lb, ub, sched, current, usage, capacity, precedences=None):
+    """Greedy buckets for the ``free`` flights against the capacity left by the others."""
+    idx, local, local_capacity, precedences = _restrict(free, lb, ub, current, usage, capacity, precedences)
+    return greedy_assign(lb[idx], ub[idx], sched[idx], local, local_capacity, precedences)
+
+def solve_free(free, lb, ub, sched, current, usage, capacity, time_limit, workers,
+               extra_costs=None, deviation_weight=1, precedences=None, precedence_penalty=0):
+    """Solve the ``free`` flights against the capacity left by all other flights in ``current``."""
+    idx, local, local_capacity, precedences = _restrict(free, lb, ub, current, usage, capacity, precedences)
+    if not ortools_available():
+        return greedy_assign(lb[idx], ub[idx], sched[idx], local, local_capacity, precedences), "GREEDY"
+    picked, stats = optimize_buckets(lb[idx], ub[idx], sched[idx], local, local_capacity,
+                                     time_limit, workers, hint=current[idx],
+                                     extra_costs=None if extra_costs is None else extra_costs[idx],
+                                     deviation_weight=deviation_weight, precedences=precedences,
+                                     precedence_penalty=precedence_penalty)
+    return picked, stats["status"]
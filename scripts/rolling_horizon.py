@@ -0,0 +1,177 @@
+import json
+import time
+import numpy as np
+import pandas as pd
+from scripts.capacity import add_windows, flight_usage
+from scripts.reoptimize import FLIGHT_KEY, solve_free
+from scripts.rotations import rotation_precedences
+
+# Flights are identified by FLIGHT_KEY with the published departure as ``key_dep``, so a retimed
+# flight (new ``sched_dep``) keeps its identity
+STATE_KEY = FLIGHT_KEY[:-1] + ["key_dep"]
+STATE_COLS = ["sched_dep", "sched_arr", "act_dep", "cancelled", "opt_dep"]
+TIME_COLS = ["sched_dep", "key_dep", "new_sched_dep", "sched_arr", "act_dep", "opt_dep", "now"]
+
+def _keyed(df):
+    """Normalize key columns and index ``df`` by STATE_KEY."""
+    df = df.copy()
+    for col in FLIGHT_KEY[:-1]:
+        df[col] = df[col].fillna("").astype(str).str.strip().str.upper() if col in df.columns else ""
+    for col in TIME_COLS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+    df["key_dep"] = df["key_dep"].fillna(df["sched_dep"]) if "key_dep" in df.columns else df["sched_dep"]
+    return df.set_index(STATE_KEY)
+
+def initial_state(flights, previous=None):
+    """In-memory flight table indexed by STATE_KEY, optionally starting from a previous plan.
+
+    The previous plan's ``opt_dep`` is taken as published; a plan saved by a replan run also
+    restores retimed ``sched_dep`` / ``sched_arr`` values (its flights are keyed by ``key_dep``).
+    """
+    state = _keyed(flights)
+    state = state[~state.index.duplicated(keep="last")]
+    for col in STATE_COLS:
+        if col not in state.columns:
+            state[col] = False if col == "cancelled" else pd.NaT
+    if previous is not None:
+        prev = _keyed(previous)
+        prev = prev[~prev.index.duplicated()].reindex(state.index)
+        state["opt_dep"] = prev["opt_dep"]
+        for col in ["sched_dep", "sched_arr"]:
+            if col in prev.columns:
+                state[col] = pd.to_datetime(prev[col]).fillna(state[col])
+    return _typed(state)
+
+def _typed(state):
+    state = state[STATE_COLS].copy()
+    for col in ["sched_dep", "sched_arr", "act_dep", "opt_dep"]:
+        state[col] = pd.to_datetime(state[col])
+    state["cancelled"] = state["cancelled"].fillna(False).astype(bool)
+    return state
+
+def parse_updates(lines):
+    """JSON lines -> (updates indexed by STATE_KEY, latest ``now`` or None, whether a replan was requested).
+
+    Each record names a flight by carrier, tailnum, origin, dest and its published ``sched_dep``;
+    records may also carry only ``now`` (clock tick) or ``"replan": true``.
+    """
+    upd = pd.DataFrame.from_records([json.loads(line) for line in lines if line.strip()])
+    replan = "replan" in upd.columns and bool(upd["replan"].fillna(False).astype(bool).any())
+    now = pd.to_datetime(upd["now"]).max() if "now" in upd.columns and upd["now"].notna().any() else None
+    if "sched_dep" not in upd.columns:
+        return pd.DataFrame(), now, replan
+    upd = _keyed(upd[upd["sched_dep"].notna()])
+    return upd.drop(columns=["sched_dep"]), now, replan
+
+def apply_updates(state, upd):
+    """Upsert new or changed flights into ``state``; return (state, number of flights touched).
+
+    ``new_sched_dep`` retimes a flight (its arrival moves along unless ``sched_arr`` is given) and
+    clears its plan, ``act_dep`` marks it departed and ``cancelled`` removes it from planning.
+    Unknown keys are inserted as new flights; later records for the same flight win field by field.
+    """
+    cols = [c for c in upd.columns if c in STATE_COLS + ["new_sched_dep"]]
+    if upd.empty or not cols:
+        return state, 0
+    upd = upd[cols].groupby(level=STATE_KEY).last()
+    old_dep = state["sched_dep"].reindex(upd.index)
+    old_dep = old_dep.fillna(pd.Series(upd.index.get_level_values("key_dep"), index=upd.index))
+    new_dep = upd.pop("new_sched_dep") if "new_sched_dep" in upd.columns else pd.Series(pd.NaT, index=upd.index)
+    upd["sched_dep"] = new_dep.fillna(old_dep)
+
+    moved = new_dep.notna() & (new_dep != old_dep)
+    if moved.any():
+        if "sched_arr" not in upd.columns:
+            upd["sched_arr"] = pd.NaT
+        shifted = state["sched_arr"].reindex(upd.index) + (upd["sched_dep"] - old_dep)
+        upd["sched_arr"] = upd["sched_arr"].fillna(shifted.where(moved))
+        state = state.copy()
+        state.loc[state.index.intersection(upd.index[moved]), "opt_dep"] = pd.NaT
+    if "cancelled" in upd.columns:
+        upd["cancelled"] = upd["cancelled"].astype("boolean")
+    return _typed(upd.combine_first(state)), len(upd)
+
+def evict(state, now, keep_minutes=120):
+    """Drop flights that departed and landed more than ``keep_minutes`` ago; they no longer load open buckets."""
+    last = state[["sched_dep", "sched_arr", "act_dep", "opt_dep"]].max(axis=1)
+    return state[~(last < now - pd.Timedelta(minutes=keep_minutes))]
+
+def stability_costs(bucket_lb, bucket_ub, published_bucket, weight):
+    """``weight`` x |bucket - published bucket| per flight and window bucket (``extra_costs`` layout,
+    see model_builder.py); flights without a published bucket cost nothing."""
+    lb = np.asarray(bucket_lb, dtype=np.int64)
+    width = int(np.max(np.asarray(bucket_ub) - lb)) + 1 if len(lb) else 1
+    published = np.asarray(published_bucket, dtype=float)
+    costs = weight * np.abs(lb[:, None] + np.arange(width) - published[:, None])
+    return np.nan_to_num(costs, nan=0.0).astype(np.int64)
+
+def replan(state, now, cfgs, profiles, bucket, tables, kinds, horizon_minutes=180, freeze_minutes=0,
+           latency_budget=5.0, workers=8, rotations="none", min_turn_minutes=30, rotation_penalty=10,
+           stability_weight=2):
+    """Re-solve the open window [now + freeze, now + horizon) against frozen and pending flights.
+
+    Flights that departed (``act_dep`` up to ``now``) or whose planned departure is before ``now + freeze`` are
+    frozen; flights beyond the horizon keep their current plan. Both keep loading capacity. Open
+    flights may only move to buckets that have not started yet. Every open flight stores its
+    picked ``opt_dep``; the diff lists those whose bucket differs from the published ``opt_dep``
+    (or that had none, e.g. after a retime). Moving a flight away from its published bucket costs
+    ``stability_weight`` per bucket on top of the deviation from its schedule, so unchanged inputs
+    keep the published plan and an update only moves the flights that have to move. Returns
+    (state, diff rows with ``prev_opt_dep``, stats).
+    """
+    t0 = time.perf_counter()
+    earliest = now + pd.Timedelta(minutes=freeze_minutes)
+    live = state[~state["cancelled"]].reset_index()
+    dfd = add_windows(live, cfgs, profiles, bucket).reset_index(drop=True)
+    stats = {"now": str(now), "flights": len(dfd), "open": 0, "frozen": 0, "changed": 0, "status": "IDLE"}
+    if dfd.empty:
+        return state, dfd, stats
+
+    day = dfd["sched_dep"].dt.normalize()
+    lb = dfd["bucket_lb"].to_numpy(dtype=np.int64)
+    ub = dfd["bucket_ub"].to_numpy(dtype=np.int64)
+    sched = (dfd["minute"] // bucket).to_numpy(dtype=np.int64)
+    # Departed flights load the bucket they actually left in (actual times after ``now`` are not known yet)
+    departed = (dfd["act_dep"] <= now).to_numpy()
+    planned = dfd["act_dep"].where(departed).fillna(dfd["opt_dep"]).fillna(dfd["sched_dep"])
+    bucket_of = ((planned - day).dt.total_seconds() // (60 * bucket)).to_numpy(dtype=np.int64)
+    # First bucket whose departure (its midpoint) is not before ``earliest``
+    first_open = np.ceil(((earliest - day).dt.total_seconds() / 60 - bucket // 2) / bucket).to_numpy()
+    open_lb = np.maximum(lb, first_open).astype(np.int64)
+    frozen = departed | (planned < earliest).to_numpy() | (open_lb > ub)
+    is_open = ~frozen & (dfd["sched_dep"] < now + pd.Timedelta(minutes=horizon_minutes)).to_numpy()
+    lb = np.where(is_open, open_lb, lb)
+    current = np.clip(bucket_of, lb, ub)
+    stats.update(open=int(is_open.sum()), frozen=int(frozen.sum()))
+    if not is_open.any():
+        return state, dfd.iloc[0:0], stats
+
+    usage, capacity, _ = flight_usage(dfd, lb, ub, sched, bucket, tables, kinds)
+    precedences, penalty = None, 0
+    if rotations != "none":
+        dfd["bucket_lb"] = lb
+        precedences = rotation_precedences(dfd, bucket, min_turn_minutes, keep_scheduled=rotations == "hard")
+        penalty = rotation_penalty if rotations == "soft" else 0
+    published = dfd["opt_dep"]
+    published_bucket = ((published - day).dt.total_seconds() // (60 * bucket)).to_numpy()
+    stability = stability_costs(lb, ub, published_bucket, stability_weight)
+    time_limit = max(0.1, latency_budget - (time.perf_counter() - t0))
+    picked, status = solve_free(is_open, lb, ub, sched, current, usage, capacity, time_limit, workers,
+                                extra_costs=stability, precedences=precedences, precedence_penalty=penalty)
+    if status not in ("OPTIMAL", "FEASIBLE", "GREEDY"):
+        # No plan within the budget: keep the current one for this round
+        picked = current[is_open]
+
+    idx = np.flatnonzero(is_open)
+    opt_dep = (day.iloc[idx] + pd.to_timedelta(picked * bucket + bucket // 2, unit="m")).to_numpy()
+    changed = published.iloc[idx].isna().to_numpy() | (picked != published_bucket[idx])
+    rows = idx[changed]
+    diff = dfd.iloc[rows][STATE_KEY + ["sched_dep", "sched_arr"]].reset_index(drop=True)
+    diff["prev_opt_dep"] = published.iloc[rows].to_numpy()
+    diff["opt_dep"] = opt_dep[changed]
+    diff["opt_arr"] = diff["sched_arr"] + (diff["opt_dep"] - diff["sched_dep"])
+    state = state.copy()
+    state.loc[pd.MultiIndex.from_frame(dfd.iloc[idx][STATE_KEY]), "opt_dep"] = opt_dep
+    stats.update(changed=len(diff), status=status, latency=time.perf_counter() - t0)
+    return state, diff, stats
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+def rotation_index(dfd):
+    """Consecutive legs flown by the same aircraft as (prev, next) row arrays.
+
+    Rows are sorted once by (tailnum, sched_dep); neighbours with the same tail form a leg pair
+    when the first leg lands where the second one departs (legs missing from the input, e.g.
+    outside the planned airports, do not create a false connection).
+    """
+    tail, _ = pd.factorize(dfd["tailnum"].astype("string").str.strip().str.upper())
+    dep = dfd["sched_dep"].to_numpy(dtype="datetime64[m]").astype(np.int64)
+    order = np.lexsort((dep, tail))
+    prev, nxt = order[:-1], order[1:]
+    linked = (tail[prev] == tail[nxt]) & (tail[prev] >= 0)
+    if "sched_arr" in dfd.columns:
+        linked &= dfd["sched_arr"].notna().to_numpy()[prev]
+    if "dest" in dfd.columns:
+        dest = dfd["dest"].astype(str).str.upper().to_numpy()
+        origin = dfd["origin"].astype(str).str.upper().to_numpy()
+        linked &= dest[prev] == origin[nxt]
+    return prev[linked], nxt[linked]
+
+def rotation_precedences(dfd, bucket, min_turn_minutes=30, keep_scheduled=True):
+    """Turnaround constraints ``bucket[prev] - bucket[next] <= limit`` for every aircraft leg pair.
+
+    Flights depart at the middle of their assigned bucket and arrivals move with the departure,
+    so the next leg may leave no earlier than ``min_turn_minutes`` after the retimed arrival. Only
+    pairs whose windows allow a violation are returned. With ``keep_scheduled`` turnarounds that are
+    already short in the published schedule may keep their scheduled buckets, so they cannot make
+    the model infeasible on their own.
+    """
+    prev, nxt = rotation_index(dfd)
+    minute = dfd["minute"].to_numpy(dtype=np.int64)
+    arr = dfd["sched_arr"].to_numpy(dtype="datetime64[m]").astype(np.int64)
+    day = dfd["sched_dep"].dt.normalize().to_numpy(dtype="datetime64[m]").astype(np.int64)
+    # Minutes from the first leg's "departure-of-day origin" to the second leg's midnight
+    gap = day[nxt] - (arr[prev] - minute[prev]) - min_turn_minutes
+    limit = np.floor_divide(gap, bucket)
+    if keep_scheduled:
+        # Turnarounds already short in the published schedule may stay as they are
+        sched = minute // bucket
+        dep = dfd["sched_dep"].to_numpy(dtype="datetime64[m]").astype(np.int64)
+        short = dep[nxt] - arr[prev] < min_turn_minutes
+        limit = np.where(short, np.maximum(limit, sched[prev] - sched[nxt]), limit)
+    lb = dfd["bucket_lb"].to_numpy(dtype=np.int64)
+    ub = dfd["bucket_ub"].to_numpy(dtype=np.int64)
+    binding = ub[prev] - lb[nxt] > limit
+    return {"prev": prev[binding], "next": nxt[binding], "limit": limit[binding]}
+
+def localize_precedences(precedences, flights, assigned, fixed=None):
+    """Restrict precedences to ``flights`` (renumbered to positions in ``flights``).
+
+    Pairs with one leg outside ``flights`` keep that leg at its ``assigned`` bucket: the side is
+    dropped (index -1) and folded into the limit. When a ``fixed`` mask is given, pairs whose
+    outside leg is not fixed yet are removed, as are pairs with both legs outside.
+    """
+    prev, nxt, limit = precedences["prev"], precedences["next"], precedences["limit"]
+    assigned = np.asarray(assigned, dtype=np.int64)
+    fixed = np.ones(len(assigned), dtype=bool) if fixed is None else fixed
+    pos = np.full(len(assigned), -1, dtype=np.int64)
+    pos[np.asarray(flights, dtype=np.int64)] = np.arange(len(flights))
+    p, n = pos[prev], pos[nxt]
+    keep = ((p >= 0) & ((n >= 0) | fixed[nxt])) | ((n >= 0) & fixed[prev])
+    limit = limit - np.where(p < 0, assigned[prev], 0) + np.where(n < 0, assigned[nxt], 0)
+    return {"prev": p[keep], "next": n[keep], "limit": limit[keep]}
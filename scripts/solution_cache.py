@@ -0,0 +1,78 @@
+import hashlib
+import json
+import os
+import numpy as np
+
+# Bump when the model or the stored format changes so old entries are never reused
+CACHE_VERSION = 1
+SUFFIX = ".npz"
+
+def problem_key(bucket_lb, bucket_ub, sched_bucket, usage, capacity, extra_costs=None, precedences=None,
+                sched_time=None, **settings):
+    """Fingerprint of an assignment problem: windows, scheduled buckets, capacity usage rows and
+    slot capacities (see capacity.py), objective terms, rotation precedences and solver ``settings``.
+
+    Only relative quantities enter the key (``sched_time`` is taken relative to its minimum), so the
+    same flights on another date hash the same.
+    """
+    h = hashlib.sha256(f"v{CACHE_VERSION}".encode())
+    arrays = [bucket_lb, bucket_ub, sched_bucket, usage["flight"], usage["start"], capacity]
+    if precedences is not None:
+        arrays += [precedences["prev"], precedences["next"], precedences["limit"]]
+    if sched_time is not None and len(sched_time):
+        arrays.append(np.asarray(sched_time) - np.min(sched_time))
+    arrays = [np.asarray(a, dtype=np.int64) for a in arrays]
+    if extra_costs is not None:
+        arrays.append(extra_costs)
+    for a in arrays:
+        a = np.ascontiguousarray(a)
+        h.update(f"{a.dtype.str}{a.shape}".encode())
+        h.update(a.tobytes())
+    h.update(json.dumps(settings, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+def _path(cache_dir, key):
+    return os.path.join(cache_dir, key + SUFFIX)
+
+def cache_get(cache_dir, key):
+    """Cached (buckets, stats) for ``key`` or None; a hit refreshes the entry's LRU position."""
+    if not cache_dir:
+        return None
+    path = _path(cache_dir, key)
+    try:
+        with np.load(path, allow_pickle=False) as f:
+            chosen, stats = f["chosen"], json.loads(str(f["stats"]))
+    except (OSError, KeyError, ValueError):
+        return None
+    os.utime(path)
+    return chosen, stats
+
+def cache_put(cache_dir, key, chosen, stats, max_mb=512):
+    """Store a solution, then evict least recently used entries until the cache fits ``max_mb``."""
+    if not cache_dir:
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = os.path.join(cache_dir, f"{key}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        np.savez(f, chosen=np.asarray(chosen, dtype=np.int64), stats=json.dumps(stats, default=str))
+    os.replace(tmp, _path(cache_dir, key))
+    evict(cache_dir, max_mb)
+
+def evict(cache_dir, max_mb):
+    """Delete the oldest-used entries (by modification time) beyond ``max_mb``; returns how many."""
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith(SUFFIX):
+            st = os.stat(os.path.join(cache_dir, name))
+            entries.append((st.st_mtime, st.st_size, name))
+    entries.sort(reverse=True)
+    total, removed = 0, 0
+    for _, size, name in entries:
+        total += size
+        if total > max_mb * 2**20:
+            try:
+                os.remove(os.path.join(cache_dir, name))
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
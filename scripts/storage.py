@@ -0,0 +1,123 @@
+import os
+import shutil
+import pandas as pd
+
+# Low-cardinality string columns stored as categoricals in Parquet
+CATEGORICAL_COLS = ["carrier", "tailnum", "origin", "dest", "cancellationcode"]
+DATETIME_COLS = ["sched_dep", "act_dep", "sched_arr", "act_arr", "opt_dep", "opt_arr"]
+PARTITION_COLS = ["FlightDate", "Origin"]
+
+def is_parquet(path):
+    """Parquet files and partitioned Parquet directories; everything else is treated as CSV."""
+    path = str(path)
+    return path.endswith(".parquet") or os.path.isdir(path)
+
+def _schema_names(path):
+    if is_parquet(path):
+        import pyarrow.dataset as ds
+        return ds.dataset(path, format="parquet", partitioning="hive").schema.names
+    return list(pd.read_csv(path, nrows=0).columns)
+
+def _resolve(names, wanted):
+    """Map case-insensitive column names onto the names stored in the file."""
+    lookup = {n.lower(): n for n in names}
+    return [lookup[w.lower()] for w in wanted if w.lower() in lookup]
+
+def _apply_filters(df, filters):
+    ops = {
+        "==": lambda s, v: s == v, "!=": lambda s, v: s != v,
+        "<": lambda s, v: s < v, "<=": lambda s, v: s <= v,
+        ">": lambda s, v: s > v, ">=": lambda s, v: s >= v,
+        "in": lambda s, v: s.isin(v), "not in": lambda s, v: ~s.isin(v),
+    }
+    mask = pd.Series(True, index=df.index)
+    for col, op, value in filters:
+        mask &= ops[op](df[col].astype(str) if isinstance(value, str) or op.endswith("in") else df[col], value)
+    return df[mask]
+
+def read_table(path, columns=None, filters=None, lower=True):
+    """Read a CSV or Parquet table, loading only ``columns`` and rows matching ``filters``.
+
+    Column names in ``columns`` and ``filters`` are case-insensitive. ``filters`` is a list of
+    ``(column, op, value)`` tuples; for Parquet they are pushed down to partition pruning and row
+    group statistics, for CSV they are applied after parsing. Known datetime columns are returned
+    as ``datetime64`` in both cases.
+    """
+    if columns is not None or filters:
+        names = _schema_names(path)
+    if columns is not None:
+        columns = _resolve(names, columns)
+    if filters:
+        filters = [(_resolve(names, [c])[0], op, v) for c, op, v in filters]
+
+    if is_parquet(path):
+        df = pd.read_parquet(path, columns=columns, filters=filters or None)
+    else:
+        filter_cols = [c for c, _, _ in filters or []]
+        usecols = None if columns is None else list(dict.fromkeys(columns + filter_cols))
+        df = pd.read_csv(path, usecols=usecols, low_memory=False)
+        # Datetimes are parsed first so range filters on them compare timestamps, as in Parquet
+        for col in df.columns:
+            if col.lower() in DATETIME_COLS:
+                df[col] = pd.to_datetime(df[col], errors="coerce")
+        if filters:
+            df = _apply_filters(df, filters)
+            if columns is not None:
+                df = df[columns]
+    if lower:
+        df.columns = df.columns.str.lower()
+    return df.reset_index(drop=True)
+
+def select_table(df, columns=None, filters=None, lower=True):
+    """In-memory counterpart of ``read_table`` for frames handed from one stage to the next."""
+    names = list(df.columns)
+    if filters:
+        df = _apply_filters(df, [(_resolve(names, [c])[0], op, v) for c, op, v in filters])
+    if columns is not None:
+        df = df[_resolve(names, columns)]
+    if lower:
+        df = df.rename(columns=str.lower)
+    return df.reset_index(drop=True)
+
+def _partition_values(values):
+    """Dates as ``YYYY-MM-DD`` partition values (also for categorical dates of chunked reads)."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype(values.cat.categories.dtype)
+    return values.dt.strftime("%Y-%m-%d") if pd.api.types.is_datetime64_any_dtype(values) else values
+
+def partition_keys(df, partition_cols=PARTITION_COLS):
+    """Set of partition value tuples ``write_table`` would write ``df`` to."""
+    cols = [c for c in partition_cols if c in df.columns]
+    return set(zip(*(_partition_values(df[c]).astype(str) for c in cols)))
+
+def delete_partitions(path, keys, partition_cols=PARTITION_COLS):
+    """Remove the given partitions (see ``partition_keys``) from a Hive-partitioned dataset.
+
+    Chunked writes append to the dataset, so partitions left by an earlier run are cleared first.
+    """
+    for key in keys:
+        shutil.rmtree(os.path.join(path, *(f"{c}={v}" for c, v in zip(partition_cols, key))), ignore_errors=True)
+
+def write_table(df, path, partition_cols=None, append=False):
+    """Write ``df`` as CSV or Parquet depending on ``path``.
+
+    Parquet output stores low-cardinality strings as categoricals and keeps datetimes typed.
+    When ``partition_cols`` are given, ``path`` becomes a Hive-partitioned dataset directory and
+    any existing partitions with the same keys are replaced. With ``append`` the rows are added
+    to an existing CSV file or partitioned dataset instead (used for chunked writes).
+    """
+    if not is_parquet(path):
+        df.to_csv(path, index=False, mode="a" if append else "w", header=not append)
+        return
+    out = df.copy(deep=False)
+    for col in out.columns:
+        if col.lower() in CATEGORICAL_COLS and pd.api.types.is_string_dtype(out[col]):
+            out[col] = out[col].astype("category")
+    partition_cols = [c for c in partition_cols or [] if c in out.columns]
+    for col in partition_cols:
+        out[col] = _partition_values(out[col])
+    if partition_cols:
+        out.to_parquet(path, index=False, partition_cols=partition_cols,
+                       existing_data_behavior="overwrite_or_ignore" if append else "delete_matching")
+    else:
+        out.to_parquet(path, index=False)
@@ -2,47 +2,124 @@
 import pandas as pd
 import numpy as np
 
-def parse_hhmm(series):
-    """Convert HHMM or integer times (e.g., 945) into '%H%M' strings; return pandas Series of zero-padded 'HHMM'."""
-    s = series.astype(str).str.replace(r'\.0$', '', regex=True).str.replace(r'\D', '', regex=True).str.strip()
-    s = s.replace({'': pd.NA, 'nan': pd.NA})
-    s = s.fillna('')
-    s = s.apply(lambda x: x.zfill(4) if len(x) in (1,2,3) else x)
-    # Some BTS exports encode midnight as '2400' -> map to '0000'
-    s = s.replace({'2400':'0000'})
-    return s
-
-def combine_date_time(date_series, hhmm_series, tz=None):
-    """Combine date ('YYYY-MM-DD' or similar) and HHMM into pandas datetime (timezone-naive)."""
-    d = pd.to_datetime(date_series, errors='coerce')
-    t = parse_hhmm(hhmm_series)
-    # if time missing, leave NaT
-    mask = t.eq('') | t.isna()
-    dt_str = d.dt.strftime('%Y-%m-%d') + t
-    out = pd.to_datetime(dt_str, format='%Y-%m-%d%H%M', errors='coerce')
-    out[mask] = pd.NaT
-    return out
+def hhmm_to_minutes(series):
+    """Minutes after midnight for HHMM times (945, 945.0, '0945'); NaN when missing or invalid.
+
+    Midnight encoded as 2400 maps to 1440, i.e. the start of the following day.
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        v = series.astype("float64")
+    else:
+        v = pd.to_numeric(series.astype(str).str.replace(r'\.0$', '', regex=True).str.replace(r'\D', '', regex=True),
+                          errors='coerce')
+    h, m = v // 100, v % 100
+    valid = (v >= 0) & (m < 60) & ((h < 24) | (v == 2400))
+    return (h * 60 + m).where(valid)
+
+def _parse_dates(date_series):
+    """Parse dates once per unique value and broadcast back (BTS has one date per flight day)."""
+    codes, uniques = pd.factorize(date_series)
+    parsed = pd.DatetimeIndex(pd.to_datetime(np.asarray(uniques, dtype=object), errors='coerce')).normalize()
+    values = np.append(parsed.values.astype("datetime64[ns]"), np.datetime64("NaT", "ns"))
+    return values[codes]  # code -1 (missing) picks the trailing NaT
+
+def combine_date_time(date_series, hhmm_series, tz=None, ref=None, max_early_minutes=720):
+    """Combine date ('YYYY-MM-DD' or similar) and HHMM into pandas datetime (timezone-naive).
+
+    Uses integer arithmetic (date + HHMM minutes) instead of string formatting; 2400 rolls over
+    to 00:00 of the next day. When ``ref`` is given (e.g. the scheduled departure), each result
+    is moved by whole days so it falls in [ref - max_early_minutes, ref + 1440 - max_early_minutes),
+    which places overnight arrivals and departures delayed past midnight on the right day.
+    """
+    minutes = hhmm_to_minutes(hhmm_series).to_numpy()
+    out = _parse_dates(date_series) + (minutes * 60).astype("timedelta64[s]")
+    if ref is not None:
+        delta = (out - pd.to_datetime(ref).to_numpy().astype("datetime64[ns]")) / np.timedelta64(1, "m")
+        shift = -np.floor((delta + max_early_minutes) / 1440)
+        out = out + np.nan_to_num(shift).astype("timedelta64[D]")
+    return pd.Series(out, index=hhmm_series.index)
 
 def minute_of_day(ts):
     ts = pd.to_datetime(ts)
     return ts.dt.hour * 60 + ts.dt.minute
 
-def add_demand_features(df, bucket_minutes=5, horizon_60_min=True):
-    d = df.copy()
+# Demand feature name -> centered window length in minutes
+DEMAND_WINDOWS = {"roll_15": 15, "roll_60": 60}
+
+def demand_keys(df, bucket_minutes=5):
+    """Per-row (date, airport, bucket) of the scheduled departure; bucket is -1 when unknown."""
+    ts = pd.to_datetime(df["sched_dep"])
+    airport_col = next((c for c in ("Origin", "origin") if c in df.columns), None)
+    airport = df[airport_col].astype(str).to_numpy() if airport_col else np.full(len(df), "")
+    bucket = (minute_of_day(ts) // bucket_minutes).fillna(-1).to_numpy(dtype=np.int64)
+    return ts.dt.normalize().to_numpy(), airport, bucket
+
+def demand_tensor(date, airport, bucket, bucket_minutes=5):
+    """Dense (date, airport, bucket) departure counts built with a single ``np.bincount``.
+
+    Returns (counts, date_code, airport_code, dates, airports) so rows can index the tensor directly.
+    """
+    num_buckets = 1440 // bucket_minutes
+    date_code, dates = pd.factorize(date)
+    airport_code, airports = pd.factorize(airport)
+    valid = (bucket >= 0) & (date_code >= 0)
+    flat = (date_code * len(airports) + airport_code) * num_buckets + bucket
+    counts = np.bincount(flat[valid], minlength=len(dates) * len(airports) * num_buckets)
+    return counts.reshape(len(dates), len(airports), num_buckets), date_code, airport_code, dates, airports
+
+def demand_counts(df, bucket_minutes=5):
+    """Departure counts per bucket as ``{(date, airport): array}``, for accumulating across chunks."""
+    counts, _, _, dates, airports = demand_tensor(*demand_keys(df, bucket_minutes), bucket_minutes)
+    return {(dates[i], airports[j]): counts[i, j] for i, j in zip(*np.nonzero(counts.sum(axis=2)))}
+
+def merge_demand_counts(total, counts):
+    """Add the ``demand_counts`` of one chunk into ``total`` in place."""
+    for key, c in counts.items():
+        total[key] = total[key] + c if key in total else c.copy()
+    return total
+
+def rolling_sums(counts, width):
+    """Centered rolling sum of ``width`` buckets along the last axis (partial windows at day edges).
+
+    Matches ``Series.rolling(width, min_periods=1, center=True).sum()`` via cumulative-sum differences.
+    """
+    num_buckets = counts.shape[-1]
+    csum = np.concatenate([np.zeros(counts.shape[:-1] + (1,)), np.cumsum(counts, axis=-1)], axis=-1)
+    lo = np.clip(np.arange(num_buckets) - width // 2, 0, num_buckets)
+    hi = np.clip(np.arange(num_buckets) - width // 2 + width, 0, num_buckets)
+    return csum[..., hi] - csum[..., lo]
+
+def add_demand_features(df, bucket_minutes=5, horizon_60_min=True, copy=True, counts=None, windows=None):
+    """Attach per-(date, origin, bucket) demand: ``count`` plus centered rolling window sums.
+
+    ``windows`` maps feature names to window lengths in minutes (default ``DEMAND_WINDOWS``) and
+    is converted to buckets of ``bucket_minutes``. ``counts`` (from ``demand_counts``) overrides
+    the counts taken from ``df`` itself, e.g. totals accumulated over a streamed file.
+    """
+    d = df.copy() if copy else df
     d["dep_ts"] = pd.to_datetime(d["sched_dep"])
     d["dep_minute"] = minute_of_day(d["dep_ts"])
     d["bucket"] = (d["dep_minute"] // bucket_minutes).astype('Int64')
-    counts = d.groupby("bucket").size().rename("count").to_frame().reset_index()
-    # Ensure full day buckets exist
-    full = pd.DataFrame({"bucket": range(0, 1440 // bucket_minutes)})
-    counts = full.merge(counts, on="bucket", how="left").fillna({"count":0})
-    counts["roll_15"] = counts["count"].rolling(3, min_periods=1, center=True).sum()  # 3*5=15
-    counts["roll_60"] = counts["count"].rolling(12, min_periods=1, center=True).sum() # 12*5=60
-    d = d.merge(counts, on="bucket", how="left")
+
+    date, airport, bucket = demand_keys(d, bucket_minutes)
+    tensor, date_code, airport_code, dates, airports = demand_tensor(date, airport, bucket, bucket_minutes)
+    if counts is not None:
+        empty = np.zeros(tensor.shape[-1], dtype=np.int64)
+        tensor = np.array([[counts.get((dt, ap), empty) for ap in airports] for dt in dates]).reshape(tensor.shape)
+
+    valid = (bucket >= 0) & (date_code >= 0)
+    idx = (date_code[valid], airport_code[valid], bucket[valid])
+    features = {"count": tensor}
+    for name, minutes in (windows or DEMAND_WINDOWS).items():
+        features[name] = rolling_sums(tensor, max(1, round(minutes / bucket_minutes)))
+    for name, values in features.items():
+        col = np.full(len(d), np.nan)
+        col[valid] = values[idx]
+        d[name] = col
     return d
 
-def label_delays(df):
-    d = df.copy()
+def label_delays(df, copy=True):
+    d = df.copy() if copy else df
     d["dep_delay"] = (pd.to_datetime(d["act_dep"]) - pd.to_datetime(d["sched_dep"])).dt.total_seconds()/60.0
     d["dep_delay"] = d["dep_delay"].fillna(0).clip(lower=0)
     d["arr_delay"] = (pd.to_datetime(d["act_arr"]) - pd.to_datetime(d["sched_arr"])).dt.total_seconds()/60.0
@@ -0,0 +1,42 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from scripts.capacity import KINDS, add_windows, flight_usage, profile_tables
+from scripts.greedy import greedy_assign
+from scripts.rolling_horizon import initial_state, replan
+
+pytest.importorskip("ortools")
+
+def congested_day(n=90, seed=0):
+    """``n`` JFK departures packed into one morning hour, more than the departure capacity."""
+    rng = np.random.default_rng(seed)
+    sched = pd.Timestamp("2025-01-01 08:00") + pd.to_timedelta(np.sort(rng.integers(0, 60, n)), unit="m")
+    return pd.DataFrame({"carrier": "AA", "tailnum": [f"N{i}" for i in range(n)], "origin": "JFK",
+                         "dest": "LAX", "sched_dep": sched, "sched_arr": sched + pd.Timedelta(hours=5),
+                         "act_dep": pd.NaT})
+
+def published_plan(flights, cfgs, bucket, tables):
+    """A capacity-feasible plan from another solver (greedy), as an earlier optimize run would publish."""
+    dfd = add_windows(flights, cfgs, ["JFK"], bucket).reset_index(drop=True)
+    lb, ub = dfd["bucket_lb"].to_numpy(), dfd["bucket_ub"].to_numpy()
+    sched = (dfd["minute"] // bucket).to_numpy()
+    usage, capacity, _ = flight_usage(dfd, lb, ub, sched, bucket, tables)
+    chosen = greedy_assign(lb, ub, sched, usage, capacity)
+    opt_dep = dfd["sched_dep"].dt.normalize() + pd.to_timedelta(chosen * bucket + bucket // 2, unit="m")
+    return dfd.assign(opt_dep=opt_dep)
+
+def test_replan_without_updates_emits_no_diffs():
+    with open("configs/airports.json") as f:
+        cfgs = json.load(f)
+    bucket, tables, _ = profile_tables(cfgs, ["JFK"], KINDS, "Instrument")
+    flights = congested_day()
+    previous = published_plan(flights, cfgs, bucket, tables)
+    assert (previous["opt_dep"].dt.floor(f"{bucket}min") != previous["sched_dep"].dt.floor(f"{bucket}min")).any()
+
+    state = initial_state(flights, previous)
+    now = pd.Timestamp("2025-01-01 07:00")
+    for _ in range(3):
+        state, diff, stats = replan(state, now, cfgs, ["JFK"], bucket, tables, KINDS)
+        assert stats["status"] in ("OPTIMAL", "FEASIBLE")
+        assert diff.empty